@@ -2,11 +2,16 @@
 API Integrations for Eco-Go
 This module handles external API connections for mapping, weather, and carbon data
 """
-import requests
-import json
 import os
-from datetime import datetime, timedelta
-from urllib.parse import quote
+from cache import cached_geocode
+from carbon_calculator import (
+    calculate_batch_emissions, get_emissions_factor, get_environmental_impact, get_regional_adjustment
+)
+from config import Config
+from geometry import decode_polyline
+from providers import cached_route_profile, geocode_address
+from regions import region_for
+from weather import current_weather, route_weather, weather_forecast, weather_many
 
 class MapsAPI:
     """
@@ -29,41 +34,23 @@ class MapsAPI:
             dict: Route information including distance, duration, and coordinates
         """
         
-        osrm_mode = self._convert_transport_mode(transport_mode)
-        
-        coords = f"{start[1]},{start[0]};{end[1]},{end[0]}"
-        
-        url = f"{self.base_url}/{osrm_mode}/{coords}"
-        
-        try:
-            response = requests.get(url, params={
-                'overview': 'full',
-                'geometries': 'geojson',
-                'steps': 'true'
-            })
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['code'] == 'Ok' and len(data['routes']) > 0:
-                    route = data['routes'][0]
-                    return {
-                        'distance': route['distance'] / 1000,  
-                        'duration': route['duration'] / 60,   
-                        'coordinates': route['geometry']['coordinates'],
-                        'success': True
-                    }
-            
+        profile = self._convert_transport_mode(transport_mode)
+        route = cached_route_profile(start, end, profile)
+        if route is None:
             return {
                 'success': False,
-                'error': 'Failed to get route information',
-                'status_code': response.status_code
-            }
-        
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
+                'error': 'Failed to get route information'
             }
+
+        result = {
+            'distance': route['distance'],
+            'duration': route['duration'],
+            'coordinates': [[lng, lat] for lat, lng in decode_polyline(route['geometry'], precision=6)],
+            'success': True
+        }
+        if route.get('estimate'):
+            result['estimate'] = True
+        return result
     
     def get_routes_comparison(self, start, end):
         """
@@ -106,20 +93,17 @@ class MapsAPI:
         }
     
     def geocode(self, address):
-    url = "https://nominatim.openstreetmap.org/search"
-    try:
-        response = requests.get(url, params={
-            'q': address,
-            'format': 'json',
-            'limit': 1
-        }, headers={'User-Agent': 'eco-route-app'})
-        data = response.json()
-        if data:
-            return (float(data[0]['lat']), float(data[0]['lon']))
-        return None
-    except Exception:
-        return None
-    
+        """
+        Convert an address to coordinates, using the shared geocode cache
+
+        Args:
+            address (str): Address to look up
+
+        Returns:
+            tuple: (latitude, longitude), or None if not found
+        """
+        return cached_geocode(address, geocode_address)
+
     def _convert_transport_mode(self, mode):
         """Convert between app transport modes and API modes"""
         mode_map = {
@@ -150,10 +134,13 @@ class MapsAPI:
 class WeatherAPI:
     """
     Handles interactions with weather APIs to get weather information
+    Lookups go through the providers in Config.WEATHER_PROVIDERS and the weather tile cache,
+    which read their credentials from Config (e.g. Config.WEATHER_API_KEY)
     """
-    def __init__(self, api_key=None):
-        self.api_key = api_key or os.environ.get('WEATHER_API_KEY') or 'demo_key'
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+    def _coordinates(self, location):
+        if isinstance(location, (tuple, list)):
+            return tuple(location[:2])
+        return cached_geocode(location, geocode_address)
     
     def get_weather(self, location):
         """
@@ -165,24 +152,16 @@ class WeatherAPI:
         Returns:
             dict: Weather information
         """
-        
-        if isinstance(location, tuple):
-            lat, lng = location
-        else:
-            hash_val = sum(ord(c) for c in str(location)) % 5
-            
-            weather_conditions = [
-                {'main': 'Clear', 'description': 'clear sky', 'temp': 22, 'humidity': 50},
-                {'main': 'Clouds', 'description': 'few clouds', 'temp': 18, 'humidity': 60},
-                {'main': 'Rain', 'description': 'light rain', 'temp': 15, 'humidity': 80},
-                {'main': 'Snow', 'description': 'light snow', 'temp': 0, 'humidity': 90},
-                {'main': 'Thunderstorm', 'description': 'thunderstorm', 'temp': 17, 'humidity': 85}
-            ]
-            
-            return {
-                'success': True,
-                'weather': weather_conditions[hash_val]
-            }
+        coords = self._coordinates(location)
+        if not coords:
+            return {'success': False, 'error': 'Location not found'}
+        weather = current_weather(coords)
+        if weather is None:
+            return {'success': False, 'error': 'Weather unavailable'}
+        return {
+            'success': True,
+            'weather': weather
+        }
     
     def get_weather_forecast(self, location, days=5):
         """
@@ -190,42 +169,56 @@ class WeatherAPI:
         
         Args:
             location (str or tuple): Location as string address or (lat, lng) tuple
-            days (int): Number of days for forecast
+            days (int): Number of days for forecast (at most 5)
             
         Returns:
             dict: Weather forecast information
         """
-        if isinstance(location, tuple):
-            lat, lng = location
-        else:
-            hash_val = sum(ord(c) for c in str(location)) % 5
-            
-            weather_conditions = [
-                {'main': 'Clear', 'description': 'clear sky', 'temp': 22, 'humidity': 50},
-                {'main': 'Clouds', 'description': 'few clouds', 'temp': 18, 'humidity': 60},
-                {'main': 'Rain', 'description': 'light rain', 'temp': 15, 'humidity': 80},
-                {'main': 'Snow', 'description': 'light snow', 'temp': 0, 'humidity': 90},
-                {'main': 'Thunderstorm', 'description': 'thunderstorm', 'temp': 17, 'humidity': 85}
-            ]
-            
-            forecast = []
-            base_condition = weather_conditions[hash_val]
+        coords = self._coordinates(location)
+        if not coords:
+            return {'success': False, 'error': 'Location not found'}
+        forecast = weather_forecast(coords, days)
+        if forecast is None:
+            return {'success': False, 'error': 'Weather unavailable'}
+        return {
+            'success': True,
+            'forecast': forecast
+        }
+    
+    def get_weather_many(self, points):
+        """
+        Get current weather for several (lat, lng) points, e.g. along a route
+        
+        Args:
+            points (list): (lat, lng) tuples
             
-            for i in range(days):            
-                day_offset = (i * 3) % 5
-                day_condition = weather_conditions[(hash_val + day_offset) % 5].copy()
-                
-                day_condition['temp'] = base_condition['temp'] + ((i % 3) - 1) * 2
-                
-                forecast_date = datetime.now() + timedelta(days=i)
-                day_condition['date'] = forecast_date.strftime("%Y-%m-%d")
-                
-                forecast.append(day_condition)
+        Returns:
+            dict: Weather per point (None where unavailable), in input order
+        """
+        return {
+            'success': True,
+            'weather': weather_many([tuple(point[:2]) for point in points])
+        }
+    
+    def get_route_weather(self, start, end):
+        """
+        Get weather along a route and the transport suggestion it leads to
+        
+        Args:
+            start (str or tuple): Start address or (lat, lng)
+            end (str or tuple): End address or (lat, lng)
             
-            return {
-                'success': True,
-                'forecast': forecast
-            }
+        Returns:
+            dict: Sampled points with their weather, and advice (None in fair weather)
+        """
+        start_coords = self._coordinates(start)
+        end_coords = self._coordinates(end)
+        if not start_coords or not end_coords:
+            return {'success': False, 'error': 'Location not found'}
+        weather = route_weather(start_coords, end_coords)
+        if weather is None:
+            return {'success': False, 'error': 'Weather unavailable'}
+        return dict(weather, success=True)
 
 
 class CarbonAPI:
@@ -233,16 +226,7 @@ class CarbonAPI:
     Interface to carbon footprint data and calculations
     """
     def __init__(self):
-        self.emissions_data = {
-            'walking': 0,
-            'biking': 0,
-            'bus': 68,
-            'train': 41,
-            'car_small': 120,
-            'car_medium': 170,
-            'car_large': 220,
-            'rideshare': 180
-        }
+        self.emissions_data = Config.EMISSIONS
     
     def get_emissions_factor(self, transport_mode, region=None):
         """
@@ -255,27 +239,27 @@ class CarbonAPI:
         Returns:
             float: Emissions factor in grams CO2 per kilometer
         """
+        return get_emissions_factor(transport_mode, region)
+    
+    def get_region(self, lat, lng):
+        """
+        Emission region containing a point, for passing as `region` to the methods below
         
-        base_factor = self.emissions_data.get(transport_mode, 0)
-        
-        if region:
-            regional_factor = self._get_regional_adjustment(region)
-            return base_factor * regional_factor
-        
-        return base_factor
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+            
+        Returns:
+            str: Region name, or None if the point is outside every known region
+        """
+        return region_for((lat, lng))
     
     def _get_regional_adjustment(self, region):
         """
         Get regional adjustment factor for emissions
         Some regions have more efficient public transport or cleaner electricity
         """
-        regional_factors = {
-            'europe': 0.9, 
-            'usa': 1.1,    
-            'asia': 1.05 
-        }
-        
-        return regional_factors.get(region.lower(), 1.0)
+        return get_regional_adjustment(region)
     
     def calculate_trip_emissions(self, transport_mode, distance, region=None):
         """
@@ -291,6 +275,21 @@ class CarbonAPI:
         """
         emissions_factor = self.get_emissions_factor(transport_mode, region)
         return emissions_factor * distance
+
+    def calculate_trips_emissions(self, transport_modes, distances, regions=None, baseline_mode='car_medium'):
+        """
+        Calculate emissions and savings for many trips in one vectorized pass
+        
+        Args:
+            transport_modes (array-like): Modes of transportation
+            distances (array-like): Distances in kilometers
+            regions (array-like, optional): Geographic region per trip
+            baseline_mode (str): Mode that savings are measured against
+            
+        Returns:
+            dict: Arrays of emissions, savings and impact equivalents, see calculate_batch_emissions
+        """
+        return calculate_batch_emissions(transport_modes, distances, regions, baseline_mode)
     
     def get_equivalent_impact(self, carbon_grams):
         """
@@ -302,11 +301,4 @@ class CarbonAPI:
         Returns:
             dict: Dictionary of equivalent environmental impacts
         """
-        tree_absorption_yearly = 21000  
-        driving_emissions_per_km = 170
-        
-        return {
-            'tree_days': carbon_grams / (tree_absorption_yearly / 365),
-            'car_km_equivalent': carbon_grams / driving_emissions_per_km,
-            'carbon_kg': carbon_grams / 1000
-        }
+        return get_environmental_impact(carbon_grams)
@@ -12,18 +12,28 @@ app.config.from_object(Config)
 db.init_app(app)
 login_manager.init_app(app)
 
-from models import User, Route, SavedRoute
+from models import User, Location, Route, SavedRoute, UserStats, UserModeStats, DailySavings
 
 @login_manager.user_loader
 def load_user(id):
     return User.query.get(int(id))
 
 from routes import init_routes
+from commands import init_commands
+from migrations import schema_lock, upgrade_schema
+from warmer import start_cache_warmer
+from estimator import start_estimator_calibration
+from timing import init_timing
 
+init_timing(app)
 init_routes(app, db)
+init_commands(app, db)
+start_cache_warmer(app)
+start_estimator_calibration()
 
-with app.app_context():
-    db.create_all()
+if Config.AUTO_UPGRADE_SCHEMA:
+    with app.app_context(), schema_lock(Config.SCHEMA_LOCK_PATH):
+        upgrade_schema(db)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,145 @@
+"""
+Address autocomplete for Eco-Go
+In-memory prefix index over the Locations of saved routes, ranked by how often
+each place appears in SavedRoute; the geocode cache fills in coordinates the
+Location lacks. Free-text queries that were only geocoded are never indexed, so
+the index stays bounded by saved data and never suggests anonymous input. Each
+worker keeps its own index and catches up with new trips by id watermark.
+"""
+import bisect
+import threading
+import time
+from sqlalchemy import func
+from cache import geocode_cache, normalize_address
+from config import Config
+from extensions import db
+from models import Location, Route, SavedRoute
+
+MAX_SUGGESTIONS = 20
+
+# Prefixes matching more terms than this are ranked once and kept until an update touches them
+SCAN_LIMIT = 256
+
+# Locations loaded per query when new trips reference them
+LOAD_BATCH = 500
+
+
+def _terms(key):
+    """Every word-start suffix of a key, so "kings cross" is found by "kin" and by "cro\""""
+    words = key.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class AutocompleteIndex:
+    """
+    Sorted (term, key) list searched with bisect, plus a cache of ranked
+    results for short, crowded prefixes
+    """
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._places = {}
+        self._terms = []
+        self._ranked = {}
+        self._location_keys = {}
+        self._saved_route_watermark = 0
+        self._synced_at = None
+
+    def add(self, key, name, lat=None, lng=None, uses=0):
+        """Add a place or bump its usage count; coordinates fill in if missing"""
+        if not key:
+            return
+        with self._lock:
+            place = self._places.get(key)
+            if place is None:
+                self._places[key] = {'name': name, 'lat': lat, 'lng': lng, 'uses': uses}
+                for term in _terms(key):
+                    bisect.insort(self._terms, (term, key))
+                self._invalidate(key)
+                return
+            if place['lat'] is None and lat is not None:
+                place['lat'], place['lng'] = lat, lng
+            if uses:
+                place['uses'] += uses
+                self._invalidate(key)
+
+    def _invalidate(self, key):
+        for term in _terms(key):
+            for end in range(1, len(term) + 1):
+                self._ranked.pop(term[:end], None)
+
+    def search(self, query, limit=8):
+        """
+        Places matching a typed prefix, most used first
+
+        Returns:
+            list: [{'name', 'lat', 'lng', 'uses'}, ...]
+        """
+        prefix = normalize_address(query)
+        if not prefix:
+            return []
+        with self._lock:
+            ranked = self._ranked.get(prefix)
+            if ranked is None:
+                lo = bisect.bisect_left(self._terms, (prefix,))
+                hi = bisect.bisect_left(self._terms, (prefix + '\U0010ffff',), lo)
+                keys = {key for _, key in self._terms[lo:hi]}
+                ranked = sorted(
+                    keys, key=lambda k: (-self._places[k]['uses'], len(self._places[k]['name']), k)
+                )[:MAX_SUGGESTIONS]
+                if hi - lo > SCAN_LIMIT:
+                    self._ranked[prefix] = ranked
+            return [dict(self._places[key]) for key in ranked[:limit]]
+
+    def sync(self, force=False):
+        """
+        Pull SavedRoutes newer than the watermark, and the Locations they
+        start or end at, from the database. Throttled to once per
+        sync_interval; the first call loads everything.
+        """
+        if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        # Another thread is already syncing; serve what is indexed
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            usage = db.session.query(
+                Route.start_location_id, Route.end_location_id,
+                func.count(SavedRoute.id), func.max(SavedRoute.id)
+            ).join(Route, SavedRoute.route_id == Route.id)\
+                .filter(SavedRoute.id > self._saved_route_watermark)\
+                .group_by(Route.start_location_id, Route.end_location_id)\
+                .all()
+            new_ids = sorted({location_id for start_id, end_id, _, _ in usage for location_id in (start_id, end_id)
+                              if location_id is not None and location_id not in self._location_keys})
+            for i in range(0, len(new_ids), LOAD_BATCH):
+                locations = db.session.query(Location.id, Location.key, Location.name, Location.lat, Location.lng)\
+                    .filter(Location.id.in_(new_ids[i:i + LOAD_BATCH]))\
+                    .all()
+                for location in locations:
+                    lat, lng = location.lat, location.lng
+                    if lat is None:
+                        coords = geocode_cache.get(location.key)
+                        if coords:
+                            lat, lng = coords[0], coords[1]
+                    self._location_keys[location.id] = location.key
+                    self.add(location.key, location.name, lat, lng)
+
+            watermark = self._saved_route_watermark
+            for start_id, end_id, count, max_id in usage:
+                for location_id in (start_id, end_id):
+                    key = self._location_keys.get(location_id)
+                    if key:
+                        self.add(key, None, uses=count)
+                watermark = max(watermark, max_id)
+            self._saved_route_watermark = watermark
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def __len__(self):
+        return len(self._places)
+
+
+autocomplete_index = AutocompleteIndex(sync_interval=Config.AUTOCOMPLETE_SYNC_INTERVAL)
@@ -0,0 +1,285 @@
+"""
+End-to-end latency and throughput benchmark for the main endpoints
+
+Starts the Nominatim/OSRM stubs, points a fresh app (temporary database,
+caches and job queue) at them, seeds benchmark users, then drives /route,
+/api/route_options, /dashboard, /profile and /api/save_route through the
+Flask test client at each concurrency level. Results are written as JSON so
+runs can be compared across commits:
+
+    python benchmarks/endpoints.py --output before.json
+    git checkout my-branch
+    python benchmarks/endpoints.py --output after.json --compare before.json
+
+Requests are generated from --seed, so two runs send the same sequence.
+Pairs repeat once --requests exceeds --pairs, so later requests measure the
+warm-cache path.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed_data import place_names, seed_data  # noqa: E402
+from stub_servers import NOT_FOUND_PREFIX, start_stub_servers  # noqa: E402
+
+ENDPOINTS = ('route', 'route_options', 'dashboard', 'profile', 'save_route')
+
+# Latency/throughput changes beyond this fraction are reported as regressions by --compare
+DEFAULT_THRESHOLD = 0.10
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(timings, statuses, wall_seconds):
+    """Latency percentiles (ms), error count and throughput for one endpoint run"""
+    errors = sum(status >= 400 for status in statuses)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'error_rate': round(errors / len(timings), 4) if timings else None,
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+        'throughput_rps': round(len(timings) / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+def build_requests(endpoint, count, pairs, seed):
+    """
+    The deterministic request sequence for an endpoint
+
+    Returns:
+        list: (method, path, kwargs) for client.open
+    """
+    rng = random.Random(f'{seed}:{endpoint}')
+    requests = []
+    for i in range(count):
+        start, end = pairs[i % len(pairs)]
+        if endpoint == 'route':
+            requests.append(('POST', '/route', {'data': {'start': start, 'end': end}}))
+        elif endpoint == 'route_options':
+            requests.append(('GET', '/api/route_options', {'query_string': {'start': start, 'end': end}}))
+        elif endpoint == 'dashboard':
+            requests.append(('GET', '/dashboard', {}))
+        elif endpoint == 'profile':
+            requests.append(('GET', '/profile', {}))
+        elif endpoint == 'save_route':
+            distance = round(rng.uniform(1, 30), 2)
+            requests.append(('POST', '/api/save_route', {'json': {
+                'start': start, 'end': end, 'distance': distance,
+                'transport_mode': rng.choice(['walking', 'biking', 'bus', 'train']),
+                'carbon_saved': round(distance * 100, 2)
+            }}))
+    return requests
+
+
+def run_endpoint(app, endpoint, requests, concurrency, user_ids):
+    """
+    Send requests from `concurrency` threads, each with its own logged-in test client
+
+    Returns:
+        dict: summarize() of the run
+    """
+    timings = []
+    statuses = []
+    lock = threading.Lock()
+    next_index = iter(range(len(requests)))
+    index_lock = threading.Lock()
+
+    def worker(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            method, path, kwargs = requests[index]
+            started = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.append(elapsed)
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(user_ids[i % len(user_ids)],)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(timings, statuses, time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args, workdir, nominatim_url, osrm_url):
+    """Point the app at the stubs and at throwaway storage; must run before `app` is imported"""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CACHE_DB_PATH': os.path.join(workdir, 'cache.db') if args.shared_cache else '',
+        'JOB_DB_PATH': os.path.join(workdir, 'jobs.db'),
+        'NOMINATIM_URL': nominatim_url,
+        'OSRM_URL': osrm_url,
+        'GEOCODER_PROVIDERS': 'nominatim',
+        'ROUTING_PROVIDERS': 'osrm,estimate',
+        'WEATHER_PROVIDERS': 'stub',
+        'ROUTE_STREAMING': 'true' if args.route_mode == 'stream' else 'false',
+        'ROUTE_JOBS': 'true' if args.route_mode == 'jobs' else 'false',
+        'CACHE_WARM_INTERVAL': '0',
+        'ESTIMATE_CALIBRATE_INTERVAL': '0',
+    })
+
+
+def run(args):
+    nominatim, osrm = start_stub_servers(args.latency_ms, args.jitter_ms, args.failure_rate, args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, workdir, nominatim.url, osrm.url)
+        from app import app
+
+        with app.app_context():
+            started = time.perf_counter()
+            user_ids = seed_data(args.users, args.routes, args.places, seed=args.seed)
+            seed_seconds = time.perf_counter() - started
+
+        rng = random.Random(args.seed)
+        names = place_names(args.places)
+        pairs = [tuple(rng.sample(names, 2)) for _ in range(args.pairs)]
+        if args.not_found_rate:
+            pairs = [(f'{NOT_FOUND_PREFIX} {start}', end) if rng.random() < args.not_found_rate else (start, end)
+                     for start, end in pairs]
+
+        results = {}
+        for endpoint in args.endpoints:
+            results[endpoint] = {}
+            for concurrency in args.concurrency:
+                requests = build_requests(endpoint, args.warmup + args.requests, pairs, args.seed)
+                run_endpoint(app, endpoint, requests[:args.warmup], concurrency, user_ids)
+                results[endpoint][str(concurrency)] = run_endpoint(
+                    app, endpoint, requests[args.warmup:], concurrency, user_ids
+                )
+                print(f"{endpoint:>14} c={concurrency:<3} {json.dumps(results[endpoint][str(concurrency)])}",
+                      file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed_seconds': round(seed_seconds, 2),
+            'upstream': {
+                'nominatim_requests': nominatim.behaviour.requests,
+                'nominatim_failures': nominatim.behaviour.failures,
+                'osrm_requests': osrm.behaviour.requests,
+                'osrm_failures': osrm.behaviour.failures,
+            },
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    nominatim.stop()
+    osrm.stop()
+    return report
+
+
+def compare(report, baseline, threshold):
+    """
+    Relative change of p50, p95 and throughput against a previous report
+
+    Returns:
+        tuple: (rows of comparison dicts, True if any metric regressed beyond threshold)
+    """
+    rows = []
+    regressed = False
+    for endpoint, levels in report['results'].items():
+        for concurrency, current in levels.items():
+            previous = baseline.get('results', {}).get(endpoint, {}).get(concurrency)
+            if not previous:
+                continue
+            for metric, higher_is_worse in (('p50_ms', True), ('p95_ms', True), ('throughput_rps', False)):
+                if not previous.get(metric) or current.get(metric) is None:
+                    continue
+                change = (current[metric] - previous[metric]) / previous[metric]
+                worse = change > threshold if higher_is_worse else change < -threshold
+                regressed |= worse
+                rows.append({'endpoint': endpoint, 'concurrency': concurrency, 'metric': metric,
+                             'before': previous[metric], 'after': current[metric],
+                             'change': round(change, 4), 'regression': worse})
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint and concurrency')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--routes', type=int, default=200, help='Seeded SavedRoute rows per user')
+    parser.add_argument('--places', type=int, default=200)
+    parser.add_argument('--pairs', type=int, default=50, help='Distinct start/end pairs requested')
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help='Share of pairs whose start cannot be geocoded')
+    parser.add_argument('--latency-ms', type=float, default=50, help='Stub upstream latency')
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of stub upstream requests that fail')
+    parser.add_argument('--route-mode', choices=('sync', 'jobs', 'stream'), default='sync',
+                        help='How POST /route computes comparisons (ROUTE_STREAMING / ROUTE_JOBS)')
+    parser.add_argument('--shared-cache', action='store_true', help='Use the SQLite cache tier as well as memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='Previous JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 1 if --compare finds a regression')
+    args = parser.parse_args()
+
+    report = run(args)
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.threshold)
+        report['comparison'] = {'baseline_commit': baseline.get('meta', {}).get('commit'),
+                                'threshold': args.threshold, 'rows': rows, 'regressed': regressed}
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['endpoint']:>14} c={row['concurrency']:<3} {row['metric']:<15} "
+                  f"{row['before']:>10} -> {row['after']:<10} {row['change']:+.1%}{flag}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    sys.exit(1 if regressed and args.fail_on_regression else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Query-latency benchmark for the offline routing engine
+
+Builds the bundled sample graph into a temporary directory and times random
+point-to-point queries per profile.
+
+    python benchmarks/local_router_latency.py --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_router import LocalRouter, build_graph  # noqa: E402
+
+SAMPLE_OSM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'sample_city.osm')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(osm_path, queries, seed):
+    with tempfile.TemporaryDirectory() as graph_dir:
+        started = time.perf_counter()
+        meta = build_graph(osm_path, graph_dir)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        router = LocalRouter(graph_dir)
+        south, west, north, east = meta['bounds']
+        rng = random.Random(seed)
+        points = [
+            ((rng.uniform(south, north), rng.uniform(west, east)),
+             (rng.uniform(south, north), rng.uniform(west, east)))
+            for _ in range(queries)
+        ]
+
+        report = {'graph': {'nodes': meta['nodes'], 'edges': meta['edges'], 'build_ms': round(build_ms, 1)},
+                  'profiles': {}}
+        for profile in ('foot', 'bike', 'car'):
+            timings = []
+            found = 0
+            for start, end in points:
+                started = time.perf_counter()
+                result = router.route(start, end, profile)
+                timings.append((time.perf_counter() - started) * 1000)
+                found += result is not None
+            report['profiles'][profile] = {
+                'queries': queries,
+                'found': found,
+                'mean_ms': round(sum(timings) / len(timings), 3),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--osm', default=SAMPLE_OSM, help='OSM XML extract to build and query')
+    parser.add_argument('--queries', type=int, default=200, help='Random queries per profile')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.osm, args.queries, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
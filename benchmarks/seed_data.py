@@ -0,0 +1,100 @@
+"""
+Benchmark data generator
+
+Seeds N users with M SavedRoute rows each, spread over the last DAYS days
+between a fixed pool of place names, through the same batched write path as
+/api/save_routes (so UserStats and DailySavings stay consistent). Writes to
+the database configured by DATABASE_URL.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed_data.py --users 100 --routes 200
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+# Trips are written per user in batches of this size
+BATCH_SIZE = 500
+
+
+def place_names(count):
+    """The benchmark's pool of place names"""
+    return [f'Benchmark Place {i}' for i in range(count)]
+
+
+def seed_data(users, routes_per_user, places=200, days=365, seed=0):
+    """
+    Create benchmark users and their saved routes; call inside an app context
+
+    Args:
+        users (int): Users to create (usernames bench_user_<n>, password BENCHMARK_PASSWORD)
+        routes_per_user (int): SavedRoute rows per user
+        places (int): Size of the place name pool trips are drawn from
+        days (int): Trips are dated uniformly over this many past days
+        seed (int): Random seed; the same arguments always produce the same data
+
+    Returns:
+        list: Ids of the created users
+    """
+    from werkzeug.security import generate_password_hash
+    from carbon_calculator import calculate_carbon_emissions
+    from extensions import db
+    from history import save_trips
+    from models import User
+    from routes import ROUTE_MODES
+
+    rng = random.Random(seed)
+    names = place_names(places)
+    # Hashing is deliberately slow, so every benchmark user shares one hash
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+    first = db.session.query(db.func.coalesce(db.func.max(User.id), 0)).scalar() + 1
+
+    user_ids = []
+    now = datetime.utcnow()
+    for n in range(first, first + users):
+        user = User(username=f'bench_user_{n}', email=f'bench_user_{n}@example.com', password_hash=password_hash)
+        db.session.add(user)
+        db.session.commit()
+        user_ids.append(user.id)
+
+        trips = []
+        for _ in range(routes_per_user):
+            start, end = rng.sample(names, 2)
+            mode, carbon_key = rng.choice(ROUTE_MODES)
+            distance = round(rng.uniform(1, 30), 2)
+            trips.append({
+                'start': start,
+                'end': end,
+                'distance': distance,
+                'transport_mode': mode,
+                'carbon_saved': max(0.0, calculate_carbon_emissions('car_medium', distance)
+                                    - calculate_carbon_emissions(carbon_key, distance)),
+                'date_saved': now - timedelta(seconds=rng.uniform(0, days * 86400))
+            })
+        for i in range(0, len(trips), BATCH_SIZE):
+            save_trips(user.id, trips[i:i + BATCH_SIZE])
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--routes', type=int, default=100, help='SavedRoute rows per user')
+    parser.add_argument('--places', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        user_ids = seed_data(args.users, args.routes, args.places, args.days, args.seed)
+    print(f'Seeded {len(user_ids)} users with {args.routes} saved routes each.')
+
+
+if __name__ == '__main__':
+    main()
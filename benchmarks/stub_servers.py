@@ -0,0 +1,221 @@
+"""
+Local stand-ins for Nominatim and OSRM
+
+Deterministic HTTP servers speaking just enough of each API for the app:
+Nominatim /search, OSRM /route and /table. Every response waits a seeded,
+configurable latency and fails at a configurable rate, so benchmarks can
+reproduce slow or flaky upstreams without touching the public services.
+
+    python benchmarks/stub_servers.py --latency-ms 80 --jitter-ms 40 --failure-rate 0.02
+    NOMINATIM_URL=http://127.0.0.1:8901 OSRM_URL=http://127.0.0.1:8902 python app.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geometry import encode_polyline  # noqa: E402
+
+# Geocoded points fall inside this box (greater London), so routes have realistic lengths
+BOUNDS = (51.30, -0.50, 51.70, 0.30)  # south, west, north, east
+
+DETOUR_FACTORS = {'foot': 1.25, 'bike': 1.3, 'car': 1.35, 'driving': 1.35, 'walking': 1.25, 'cycling': 1.3}
+SPEEDS = {'foot': 5.0, 'bike': 15.0, 'car': 35.0, 'driving': 35.0, 'walking': 5.0, 'cycling': 15.0}  # km/h
+
+# Queries starting with this prefix are never found
+NOT_FOUND_PREFIX = 'nowhere'
+
+
+def stub_coordinates(query):
+    """Deterministic (lat, lng) inside BOUNDS for a free-text query"""
+    digest = hashlib.sha256(query.strip().casefold().encode()).digest()
+    south, west, north, east = BOUNDS
+    lat = south + (north - south) * int.from_bytes(digest[:4], 'big') / 2 ** 32
+    lng = west + (east - west) * int.from_bytes(digest[4:8], 'big') / 2 ** 32
+    return round(lat, 6), round(lng, 6)
+
+
+def _haversine_m(a, b):
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371008.8 * math.asin(math.sqrt(h))
+
+
+def _parse_coords(text):
+    """OSRM "lng,lat;lng,lat" path segment -> [(lat, lng), ...]"""
+    points = []
+    for pair in text.split(';'):
+        lng, lat = pair.split(',')
+        points.append((float(lat), float(lng)))
+    return points
+
+
+class StubBehaviour:
+    """Seeded latency and failure decisions shared by a server's handler threads"""
+    def __init__(self, latency_ms=50, jitter_ms=0, failure_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def next(self):
+        """(delay in seconds, fail?) for the next request"""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.failure_rate
+            self.failures += fail
+        return delay, fail
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        delay, fail = self.server.behaviour.next()
+        if delay:
+            time.sleep(delay)
+        url = urlparse(self.path)
+        try:
+            status, payload = self.respond(url.path, parse_qs(url.query), fail)
+        except (ValueError, IndexError, KeyError):
+            status, payload = 400, {'code': 'InvalidQuery'}
+        self._send_json(status, payload)
+
+    def respond(self, path, query, fail):
+        raise NotImplementedError
+
+
+class NominatimHandler(_StubHandler):
+    def respond(self, path, query, fail):
+        if path.rstrip('/') != '/search':
+            return 404, {'error': 'Not found'}
+        if fail:
+            return 503, {'error': 'Service unavailable'}
+        q = query.get('q', [''])[0]
+        if not q or q.strip().casefold().startswith(NOT_FOUND_PREFIX):
+            return 200, []
+        lat, lng = stub_coordinates(q)
+        return 200, [{'lat': str(lat), 'lon': str(lng), 'display_name': q}]
+
+
+class OSRMHandler(_StubHandler):
+    def respond(self, path, query, fail):
+        parts = path.strip('/').split('/')
+        if len(parts) != 4 or parts[0] not in ('route', 'table'):
+            return 404, {'code': 'InvalidUrl'}
+        if fail:
+            return 500, {'code': 'InternalError'}
+        service, _, profile, coords = parts
+        points = _parse_coords(coords)
+        detour = DETOUR_FACTORS.get(profile, 1.3)
+        speed = SPEEDS.get(profile, 35.0) / 3.6  # m/s
+
+        if service == 'route':
+            start, end = points[0], points[-1]
+            distance = _haversine_m(start, end) * detour
+            # A few intermediate points so geometry handling sees a realistic polyline
+            line = [(start[0] + (end[0] - start[0]) * i / 8, start[1] + (end[1] - start[1]) * i / 8) for i in range(9)]
+            return 200, {'code': 'Ok', 'routes': [{
+                'distance': round(distance, 1),
+                'duration': round(distance / speed, 1),
+                'geometry': encode_polyline(line, precision=6)
+            }]}
+
+        sources = [int(i) for i in query.get('sources', [''])[0].split(';')] if 'sources' in query else range(len(points))
+        destinations = [int(i) for i in query.get('destinations', [''])[0].split(';')] if 'destinations' in query else range(len(points))
+        distances = [[round(_haversine_m(points[i], points[j]) * detour, 1) for j in destinations] for i in sources]
+        return 200, {
+            'code': 'Ok',
+            'distances': distances,
+            'durations': [[round(d / speed, 1) for d in row] for row in distances]
+        }
+
+
+class StubServer:
+    """A stub running on a daemon thread; port 0 picks a free port"""
+    def __init__(self, handler, host='127.0.0.1', port=0, **behaviour):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.behaviour = StubBehaviour(**behaviour)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def behaviour(self):
+        return self.httpd.behaviour
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_stub_servers(latency_ms=50, jitter_ms=0, failure_rate=0.0, seed=0, nominatim_port=0, osrm_port=0):
+    """
+    Start a Nominatim and an OSRM stub
+
+    Returns:
+        tuple: (nominatim StubServer, osrm StubServer), already serving
+    """
+    options = {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'failure_rate': failure_rate}
+    nominatim = StubServer(NominatimHandler, port=nominatim_port, seed=seed, **options).start()
+    osrm = StubServer(OSRMHandler, port=osrm_port, seed=seed + 1, **options).start()
+    return nominatim, osrm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nominatim-port', type=int, default=8901)
+    parser.add_argument('--osrm-port', type=int, default=8902)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    nominatim, osrm = start_stub_servers(args.latency_ms, args.jitter_ms, args.failure_rate, args.seed,
+                                         args.nominatim_port, args.osrm_port)
+    print(f'NOMINATIM_URL={nominatim.url}')
+    print(f'OSRM_URL={osrm.url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        nominatim.stop()
+        osrm.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+"""
+Caching utilities for Eco-Go
+Provides an in-process LRU tier and a SQLite tier shared by every worker process
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from config import Config
+
+
+def normalize_address(address):
+    """Reduce an address to a stable cache key ("King's Cross " -> "kings cross")"""
+    if not address:
+        return ''
+    text = unicodedata.normalize('NFKC', str(address)).casefold()
+    text = re.sub(r"['’`]", '', text)
+    text = re.sub(r'[^\w]+', ' ', text)
+    return ' '.join(text.split())
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache with a per-entry expiry time
+    """
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get_entry(self, key):
+        """
+        Look up a key
+
+        Returns:
+            tuple: (value, expires_at), or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """Snapshot of unexpired (key, value) pairs"""
+        now = time.time()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at) in self._entries.items() if expires_at > now]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache tier stored in a SQLite file so every gunicorn worker shares it.
+    Values are stored as JSON. Any database error is treated as a cache miss.
+    """
+    # Only rewrite accessed_at when it is older than this, so hits stay reads
+    TOUCH_INTERVAL = 60
+    # Run eviction once every this many writes
+    EVICT_EVERY = 100
+
+    def __init__(self, path, namespace, max_size=100000, ttl=3600):
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed '
+                'ON cache_entries (namespace, accessed_at)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, key):
+        """
+        Look up a key
+
+        Returns:
+            tuple: (value, expires_at), or None if missing or expired
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT value, expires_at, accessed_at FROM cache_entries '
+                'WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at <= now:
+                conn.execute(
+                    'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                    (self.namespace, key)
+                )
+                self.evictions += 1
+                return None
+            if now - accessed_at > self.TOUCH_INTERVAL:
+                conn.execute(
+                    'UPDATE cache_entries SET accessed_at = ? '
+                    'WHERE namespace = ? AND key = ?',
+                    (now, self.namespace, key)
+                )
+            return json.loads(value), expires_at
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries '
+                '(namespace, key, value, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value), expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self.evict()
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
+
+    def delete(self, key):
+        try:
+            self._connect().execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            )
+        except sqlite3.Error:
+            pass
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones over max_size"""
+        conn = self._connect()
+        expired = conn.execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?',
+            (self.namespace, time.time())
+        )
+        trimmed = conn.execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND key IN ('
+            ' SELECT key FROM cache_entries WHERE namespace = ?'
+            ' ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.namespace, self.namespace, self.max_size)
+        )
+        self.evictions += max(expired.rowcount, 0) + max(trimmed.rowcount, 0)
+
+    def clear(self):
+        try:
+            self._connect().execute(
+                'DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,)
+            )
+        except sqlite3.Error:
+            pass
+
+    def items(self):
+        """Unexpired (key, value) pairs in this namespace"""
+        try:
+            rows = self._connect().execute(
+                'SELECT key, value FROM cache_entries WHERE namespace = ? AND expires_at > ?',
+                (self.namespace, time.time())
+            ).fetchall()
+            return [(key, json.loads(value)) for key, value in rows]
+        except (sqlite3.Error, ValueError):
+            return []
+
+    def size(self):
+        try:
+            return self._connect().execute(
+                'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+
+class TieredCache:
+    """
+    In-process MemoryCache in front of an optional shared SQLiteCache.
+    Entries found in the shared tier are promoted into memory with their
+    original expiry, so every worker agrees on when an entry goes stale.
+    """
+    def __init__(self, namespace, max_size=1024, ttl=3600, path=None, shared_max_size=100000):
+        self.namespace = namespace
+        self.memory = MemoryCache(max_size=max_size, ttl=ttl)
+        self.shared = SQLiteCache(path, namespace, max_size=shared_max_size, ttl=ttl) if path else None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get_entry(self, key):
+        entry = self.memory.get_entry(key)
+        if entry is not None:
+            self._count('memory_hits')
+            return entry
+        if self.shared is not None:
+            entry = self.shared.get_entry(key)
+            if entry is not None:
+                self._count('shared_hits')
+                self.memory.set(key, entry[0], expires_at=entry[1])
+                return entry
+        self._count('misses')
+        return None
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.memory.ttl if ttl is None else ttl)
+        self.memory.set(key, value, expires_at=expires_at)
+        if self.shared is not None:
+            self.shared.set(key, value, expires_at=expires_at)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def items(self):
+        """Unexpired (key, value) pairs from both tiers"""
+        entries = dict(self.shared.items()) if self.shared is not None else {}
+        entries.update(self.memory.items())
+        return list(entries.items())
+
+    def stats(self):
+        """Hit/miss/eviction counters for this process, plus current tier sizes"""
+        hits = self.memory_hits + self.shared_hits
+        lookups = hits + self.misses
+        return {
+            'hits': hits,
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'evictions': self.memory.evictions + (self.shared.evictions if self.shared else 0),
+            'memory_size': len(self.memory),
+            'shared_size': self.shared.size() if self.shared else None,
+        }
+
+
+geocode_cache = TieredCache(
+    'geocode',
+    max_size=Config.GEOCODE_CACHE_SIZE,
+    ttl=Config.GEOCODE_CACHE_TTL,
+    path=Config.CACHE_DB_PATH
+)
+
+route_cache = TieredCache(
+    'route',
+    max_size=Config.ROUTE_CACHE_SIZE,
+    ttl=Config.ROUTE_CACHE_TTL,
+    path=Config.CACHE_DB_PATH if Config.ROUTE_CACHE_SHARED else None
+)
+
+weather_cache = TieredCache(
+    'weather',
+    max_size=Config.WEATHER_CACHE_SIZE,
+    ttl=Config.WEATHER_FORECAST_BUCKET,
+    path=Config.CACHE_DB_PATH
+)
+
+
+def cache_stats():
+    """Counters for every application cache, keyed by cache name"""
+    return {
+        'geocode': geocode_cache.stats(),
+        'route': route_cache.stats(),
+        'weather': weather_cache.stats(),
+    }
+
+
+def cached_geocode(address, lookup):
+    """
+    Geocode an address through the shared cache
+
+    Args:
+        address (str): Free-text address
+        lookup (callable): Called with the address on a cache miss, returns (lat, lng) or None
+
+    Returns:
+        tuple: (lat, lng), or None if the address could not be found
+    """
+    key = normalize_address(address)
+    if not key:
+        return None
+
+    coords = geocode_cache.get(key)
+    if coords:
+        return tuple(coords)
+
+    coords = lookup(address)
+    if coords:
+        geocode_cache.set(key, list(coords))
+    return coords
+
+
+def snap_coords(coords, grid=None):
+    """Snap (lat, lng) to the route cache grid so nearby points share a key"""
+    grid = grid or Config.ROUTE_CACHE_GRID
+    return tuple(round(round(value / grid) * grid, 6) for value in coords[:2])
+
+
+def route_cache_key(profile, start, end, variant='summary'):
+    """
+    Build the route cache key for a profile between two grid-snapped points
+
+    Args:
+        profile (str): OSRM routing profile (foot, bike, car)
+        start (tuple): (lat, lng) of the origin
+        end (tuple): (lat, lng) of the destination
+        variant (str): Kind of response cached, e.g. 'summary' or 'full' with geometry
+    """
+    start_lat, start_lng = snap_coords(start)
+    end_lat, end_lng = snap_coords(end)
+    return f'{variant}:{profile}:{start_lat:.6f},{start_lng:.6f};{end_lat:.6f},{end_lng:.6f}'
+
+
+def cached_route(profile, start, end, lookup, variant='summary'):
+    """
+    Route between two points through the shared route cache
+
+    Args:
+        profile (str): OSRM routing profile
+        start (tuple): (lat, lng) of the origin
+        end (tuple): (lat, lng) of the destination
+        lookup (callable): Called as lookup(start, end, profile) on a cache miss, returns a dict or None;
+            dicts flagged 'estimate' are returned but not cached
+        variant (str): Kind of response cached, see route_cache_key
+
+    Returns:
+        dict: Route data, or None if the lookup failed
+    """
+    key = route_cache_key(profile, start, end, variant)
+    route = route_cache.get(key)
+    if route is not None:
+        return route
+
+    route = lookup(start, end, profile)
+    # Estimates stand in for a failed lookup; leave the slot free for a real route
+    if route and not route.get('estimate'):
+        route_cache.set(key, route)
+    return route
+
+
+def weather_tile(coords, size=None):
+    """Centre (lat, lng) of the WEATHER_TILE_DEGREES tile containing a point"""
+    size = size or Config.WEATHER_TILE_DEGREES
+    return tuple(round((math.floor(value / size) + 0.5) * size, 6) for value in coords[:2])
+
+
+def cached_weather(kind, coords, lookup, bucket_seconds):
+    """
+    Weather for a point through the shared cache, one entry per tile and time bucket
+
+    Args:
+        kind (str): 'current' or 'forecast'
+        coords (tuple): (lat, lng) of the point
+        lookup (callable): Called with the tile centre on a cache miss, returns a dict or None
+        bucket_seconds (int): Length of the time bucket; entries expire when it ends
+
+    Returns:
+        dict: Weather for the tile, or None if the lookup failed
+    """
+    tile = weather_tile(coords)
+    now = time.time()
+    bucket = int(now // bucket_seconds)
+    key = f'{kind}:{tile[0]:.6f},{tile[1]:.6f}:{bucket}'
+    weather = weather_cache.get(key)
+    if weather is not None:
+        return weather
+
+    weather = lookup(tile)
+    if weather is not None:
+        weather_cache.set(key, weather, ttl=(bucket + 1) * bucket_seconds - now)
+    return weather
@@ -1,17 +1,54 @@
+import numpy as np
 from config import Config
 
-def calculate_carbon_emissions(transport_mode, distance):
+TREE_ABSORPTION_YEARLY = 21000  # grams of CO2 a tree absorbs per year
+DRIVING_EMISSIONS_PER_KM = 170  # grams of CO2 per km for a medium car
+
+# Factor matrix for batch calculations: one row per mode (plus a zero row for
+# unknown modes), one column per region (column 0 is "no region")
+MODES = list(Config.EMISSIONS)
+REGIONS = [None] + list(Config.REGIONAL_EMISSION_FACTORS)
+UNKNOWN_MODE = len(MODES)
+_MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+_REGION_CODES = {region: code for code, region in enumerate(REGIONS)}
+FACTOR_MATRIX = np.array(
+    [[Config.EMISSIONS[mode] * Config.REGIONAL_EMISSION_FACTORS.get(region, 1.0) for region in REGIONS]
+     for mode in MODES] + [[0.0] * len(REGIONS)],
+    dtype=np.float64
+)
+
+def get_regional_adjustment(region):
+    """Multiplier applied to every emissions factor in a region (1.0 if unknown)"""
+    if not region:
+        return 1.0
+    return Config.REGIONAL_EMISSION_FACTORS.get(region.lower(), 1.0)
+
+def get_emissions_factor(transport_mode, region=None):
+    """
+    Emissions factor for a transport mode, optionally adjusted for region
+
+    Args:
+        transport_mode (str): Type of transportation
+        region (str, optional): Geographic region for regional adjustments
+
+    Returns:
+        float: Emissions factor in grams of CO2 per kilometer
+    """
+    return Config.EMISSIONS.get(transport_mode, 0) * get_regional_adjustment(region)
+
+def calculate_carbon_emissions(transport_mode, distance, region=None):
     """
     Calculate carbon emissions in grams of CO2 for a given transport mode and distance
     
     Args:
         transport_mode (str): Type of transportation
         distance (float): Distance in kilometers
+        region (str, optional): Geographic region for regional adjustments (see regions.region_for)
         
     Returns:
         float: Carbon emissions in grams of CO2
     """
-    emissions_per_km = Config.EMISSIONS.get(transport_mode, 0)
+    emissions_per_km = get_emissions_factor(transport_mode, region)
     return emissions_per_km * distance
 
 def calculate_carbon_savings(chosen_mode, alternative_mode, distance):
@@ -42,13 +79,86 @@ def get_environmental_impact(carbon_saved):
         dict: Dictionary of equivalent environmental impacts
     """
 
-    TREE_ABSORPTION_YEARLY = 21000  
-    DRIVING_EMISSIONS_PER_KM = 170  
-    
     carbon_saved_kg = carbon_saved / 1000
     
     return {
         'tree_days': carbon_saved / (TREE_ABSORPTION_YEARLY / 365),
         'car_km_equivalent': carbon_saved / DRIVING_EMISSIONS_PER_KM,
         'carbon_kg': carbon_saved_kg
-    }
\ No newline at end of file
+    }
+
+def encode_modes(modes):
+    """
+    Convert transport modes to factor matrix row codes
+
+    Args:
+        modes (array-like): Mode names or integer codes
+
+    Returns:
+        numpy.ndarray: Integer codes, UNKNOWN_MODE for unrecognised names and out-of-range codes
+    """
+    modes = np.asarray(modes)
+    if modes.dtype.kind in 'iu':
+        codes = modes.astype(np.intp)
+        return np.where((codes >= 0) & (codes < FACTOR_MATRIX.shape[0]), codes, UNKNOWN_MODE)
+    modes = modes.astype(str)
+    codes = np.full(modes.shape, UNKNOWN_MODE, dtype=np.intp)
+    for name, code in _MODE_CODES.items():
+        codes[modes == name] = code
+    return codes
+
+def encode_regions(regions, size):
+    """
+    Convert region names to factor matrix column codes
+
+    Args:
+        regions (array-like or None): Region names, integer codes, or None for no adjustment
+        size (int): Number of trips, used when regions is None
+
+    Returns:
+        numpy.ndarray: Integer codes, 0 for missing or unrecognised regions and out-of-range codes
+    """
+    if regions is None:
+        return np.zeros(size, dtype=np.intp)
+    regions = np.asarray(regions)
+    if regions.dtype.kind in 'iu':
+        codes = regions.astype(np.intp)
+        return np.where((codes >= 0) & (codes < FACTOR_MATRIX.shape[1]), codes, 0)
+    regions = np.char.lower(regions.astype(str))
+    codes = np.zeros(regions.shape, dtype=np.intp)
+    for name, code in _REGION_CODES.items():
+        if name is not None:
+            codes[regions == name] = code
+    return codes
+
+def calculate_batch_emissions(modes, distances, regions=None, baseline_mode='car_medium'):
+    """
+    Vectorized emissions, savings and impact equivalents for many trips at once
+
+    Args:
+        modes (array-like): Transport mode names or codes from encode_modes
+        distances (array-like): Distances in kilometers
+        regions (array-like, optional): Region names or codes from encode_regions
+        baseline_mode (str): Mode that savings are measured against
+
+    Returns:
+        dict: numpy arrays of emissions, baseline_emissions, carbon_saved (grams CO2)
+        and the get_environmental_impact equivalents of carbon_saved
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    mode_codes = encode_modes(modes)
+    region_codes = encode_regions(regions, distances.shape[0] if distances.ndim else 1)
+
+    emissions = FACTOR_MATRIX[mode_codes, region_codes] * distances
+    baseline_code = _MODE_CODES.get(baseline_mode, UNKNOWN_MODE)
+    baseline_emissions = FACTOR_MATRIX[baseline_code, region_codes] * distances
+    carbon_saved = np.maximum(0, baseline_emissions - emissions)
+
+    return {
+        'emissions': emissions,
+        'baseline_emissions': baseline_emissions,
+        'carbon_saved': carbon_saved,
+        'tree_days': carbon_saved / (TREE_ABSORPTION_YEARLY / 365),
+        'car_km_equivalent': carbon_saved / DRIVING_EMISSIONS_PER_KM,
+        'carbon_kg': carbon_saved / 1000
+    }
@@ -0,0 +1,74 @@
+import click
+from stats import rebuild_user_stats, rebuild_daily_savings
+from migrations import migrate_route_locations, schema_lock, upgrade_schema
+from local_router import build_graph
+from local_geocoder import build_gazetteer
+from warmer import warm_cache
+from regions import check_region_index, get_region_index
+from config import Config
+
+
+def init_commands(app, db):
+    @app.cli.command('rebuild-stats')
+    @click.option('--user-id', type=int, help='Only rebuild this user')
+    def rebuild_stats(user_id):
+        """Recompute per-user carbon stats and daily rollups from saved routes."""
+        rebuild_user_stats(user_id)
+        rebuild_daily_savings(user_id)
+        db.session.commit()
+        click.echo('User stats rebuilt.')
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Create missing tables and apply schema and data upgrades."""
+        with schema_lock(Config.SCHEMA_LOCK_PATH):
+            upgrade_schema(db)
+        click.echo('Database schema up to date.')
+
+    @app.cli.command('migrate-locations')
+    def migrate_locations():
+        """Link routes to interned locations and merge duplicate routes."""
+        migrate_route_locations(db)
+        click.echo('Routes linked to locations.')
+
+    @app.cli.command('build-graph')
+    @click.argument('osm_file', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--output', type=click.Path(file_okay=False), help='Graph directory (defaults to LOCAL_GRAPH_PATH)')
+    def build_graph_command(osm_file, output):
+        """Preprocess an OSM XML extract into the local routing graph."""
+        meta = build_graph(osm_file, output or Config.LOCAL_GRAPH_PATH)
+        click.echo(f"Graph built: {meta['nodes']} nodes, {meta['edges']} edges.")
+
+    @app.cli.command('build-gazetteer')
+    @click.argument('source', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--output', type=click.Path(file_okay=False), help='Index directory (defaults to LOCAL_GAZETTEER_PATH)')
+    def build_gazetteer_command(source, output):
+        """Preprocess a gazetteer CSV or OSM places extract into the local geocoder index."""
+        meta = build_gazetteer(source, output or Config.LOCAL_GAZETTEER_PATH)
+        click.echo(f"Gazetteer built: {meta['places']} places, {meta['names']} names.")
+
+    @app.cli.command('check-regions')
+    def check_regions():
+        """Check that places near region borders resolve to the right emission region."""
+        index = get_region_index()
+        if index is None:
+            raise click.ClickException(f'No region boundaries at {Config.REGION_BOUNDARIES_PATH}')
+        mismatches = check_region_index(index)
+        for place, expected, actual in mismatches:
+            click.echo(f'{place}: expected {expected}, got {actual}')
+        if mismatches:
+            raise click.ClickException(f'{len(mismatches)} border checks failed.')
+        click.echo('All border checks passed.')
+
+    @app.cli.command('warm-cache')
+    @click.option('--budget', type=int, help='Maximum upstream lookups (defaults to CACHE_WARM_BUDGET)')
+    @click.option('--pairs', type=int, help='Most active route pairs to consider (defaults to CACHE_WARM_PAIRS)')
+    @click.option('--days', type=int, help='Activity window in days (defaults to CACHE_WARM_DAYS)')
+    def warm_cache_command(budget, pairs, days):
+        """Refresh geocode and route cache entries for popular route pairs."""
+        summary = warm_cache(budget=budget, pairs=pairs, days=days)
+        click.echo(
+            f"Warmed {summary['pairs']} pairs: {summary['geocoded']} geocodes, {summary['routed']} routes, "
+            f"{summary['fresh']} already fresh, {summary['failed']} failed, "
+            f"{summary['calls']}/{summary['budget']} lookups used."
+        )
@@ -1,13 +1,121 @@
 import os
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-for-testing'
     
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///eco_route.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create and upgrade the schema at startup, one process at a time (held via a SQLite lock on SCHEMA_LOCK_PATH);
+    # set to false to run `flask upgrade-db` from the deploy step instead
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', 'true').lower() == 'true'
+    SCHEMA_LOCK_PATH = os.environ.get('SCHEMA_LOCK_PATH') or os.path.join(basedir, 'instance', 'schema.lock')
     
     MAPS_API_KEY = os.environ.get('MAPS_API_KEY') or 'your-maps-api-key'
     WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY') or 'your-weather-api-key'
+
+    # Weather providers tried in order (see weather.py): openweathermap, stub (deterministic, offline).
+    # Results are cached per WEATHER_TILE_DEGREES tile (~25 km) and time bucket, so nearby users share a fetch
+    WEATHER_PROVIDERS = [name.strip() for name in (os.environ.get('WEATHER_PROVIDERS') or 'openweathermap').split(',')]
+    WEATHER_TILE_DEGREES = float(os.environ.get('WEATHER_TILE_DEGREES') or 0.25)
+    WEATHER_CURRENT_BUCKET = int(os.environ.get('WEATHER_CURRENT_BUCKET') or 1800)
+    WEATHER_FORECAST_BUCKET = int(os.environ.get('WEATHER_FORECAST_BUCKET') or 3 * 3600)
+    WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE') or 1024)
+    # Points sampled along a route for weather-adjusted suggestions
+    WEATHER_ROUTE_SAMPLES = int(os.environ.get('WEATHER_ROUTE_SAMPLES') or 5)
+
+    # Shared cache file used by every worker; set to an empty string for memory-only caching
+    CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', os.path.join(basedir, 'instance', 'cache.db'))
+    GEOCODE_CACHE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL') or 30 * 24 * 3600)
+    GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE') or 2048)
+
+    # Offline gazetteer index built by `flask build-gazetteer`
+    LOCAL_GAZETTEER_PATH = os.environ.get('LOCAL_GAZETTEER_PATH') or os.path.join(basedir, 'instance', 'gazetteer')
+
+    # Distinct OSRM profiles are fetched in parallel; ROUTING_DEADLINE (seconds) bounds the whole fan-out
+    ROUTING_POOL_SIZE = int(os.environ.get('ROUTING_POOL_SIZE') or 16)
+    ROUTING_DEADLINE = float(os.environ.get('ROUTING_DEADLINE') or 8)
+    # Route options wait at most this long (seconds) for real routes; slower modes get an estimate
+    ROUTE_OPTIONS_BUDGET = float(os.environ.get('ROUTE_OPTIONS_BUDGET') or 3)
+
+    # Straight-line estimator calibration from cached routes (0 disables the background refresh)
+    ESTIMATE_CALIBRATE_INTERVAL = int(os.environ.get('ESTIMATE_CALIBRATE_INTERVAL') or 300)
+    ESTIMATE_MIN_SAMPLES = int(os.environ.get('ESTIMATE_MIN_SAMPLES') or 20)
+
+    # Offline road graph built by `flask build-graph`
+    LOCAL_GRAPH_PATH = os.environ.get('LOCAL_GRAPH_PATH') or os.path.join(basedir, 'instance', 'graph')
+
+    # Providers tried in order (see providers.py): routing from local, osrm, estimate; geocoding from local, nominatim
+    ROUTING_PROVIDERS = [name.strip() for name in (os.environ.get('ROUTING_PROVIDERS') or 'osrm,estimate').split(',')]
+    GEOCODER_PROVIDERS = [name.strip() for name in (os.environ.get('GEOCODER_PROVIDERS') or 'nominatim').split(',')]
+    PROVIDER_TIMEOUT = float(os.environ.get('PROVIDER_TIMEOUT') or 5)
+    # Upstream base URLs; point them at benchmarks/stub_servers.py to run without the public services
+    NOMINATIM_URL = (os.environ.get('NOMINATIM_URL') or 'https://nominatim.openstreetmap.org').rstrip('/')
+    OSRM_URL = (os.environ.get('OSRM_URL') or 'https://router.project-osrm.org').rstrip('/')
+    # A provider's circuit opens after BREAKER_FAILURES failures in a row and retries after BREAKER_RESET seconds
+    BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES') or 5)
+    BREAKER_RESET = float(os.environ.get('BREAKER_RESET') or 30)
+    # Hedge a second request once the first outlasts this latency percentile (0 disables hedging)
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE') or 95)
+    HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES') or 20)
+
+    # Route results are keyed on origin/destination snapped to a ROUTE_CACHE_GRID-degree grid (~110 m)
+    ROUTE_CACHE_GRID = float(os.environ.get('ROUTE_CACHE_GRID') or 0.001)
+    ROUTE_CACHE_TTL = int(os.environ.get('ROUTE_CACHE_TTL') or 7 * 24 * 3600)
+    ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE') or 4096)
+    ROUTE_CACHE_SHARED = os.environ.get('ROUTE_CACHE_SHARED', 'true').lower() == 'true'
+
+    # Outbound HTTP: one keep-alive pool, per-host concurrency caps and rate limits (requests/second);
+    # rate limits are shared across workers through CACHE_DB_PATH unless HTTP_SHARED_RATE_LIMIT is false
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE') or 16)
+    HTTP_MAX_QUEUE_WAIT = float(os.environ.get('HTTP_MAX_QUEUE_WAIT') or 10)
+    HTTP_SHARED_RATE_LIMIT = os.environ.get('HTTP_SHARED_RATE_LIMIT', 'true').lower() == 'true'
+    HTTP_HOST_LIMITS = {
+        'default': {'concurrency': 8},
+        'nominatim.openstreetmap.org': {'concurrency': 1, 'rate': 1, 'burst': 1},
+        'router.project-osrm.org': {'concurrency': 8, 'rate': 10, 'burst': 10},
+    }
+
+    # Cache warmer: refresh entries expiring within CACHE_WARM_REFRESH_WITHIN seconds for the CACHE_WARM_PAIRS
+    # route pairs most saved in the last CACHE_WARM_DAYS, spending at most CACHE_WARM_BUDGET upstream lookups
+    # per cycle; CACHE_WARM_INTERVAL > 0 runs a cycle that often in a background thread
+    CACHE_WARM_INTERVAL = float(os.environ.get('CACHE_WARM_INTERVAL') or 0)
+    CACHE_WARM_BUDGET = int(os.environ.get('CACHE_WARM_BUDGET') or 100)
+    CACHE_WARM_PAIRS = int(os.environ.get('CACHE_WARM_PAIRS') or 200)
+    CACHE_WARM_DAYS = int(os.environ.get('CACHE_WARM_DAYS') or 14)
+    CACHE_WARM_REFRESH_WITHIN = float(os.environ.get('CACHE_WARM_REFRESH_WITHIN') or 24 * 3600)
+
+    # The /route page streams each mode from /api/route_options/stream as it is computed. Off by default:
+    # each stream holds a WSGI worker for the whole upstream latency, which ROUTE_JOBS avoids.
+    # Only enable it behind a server with async or many-threaded workers.
+    ROUTE_STREAMING = os.environ.get('ROUTE_STREAMING', 'false').lower() == 'true'
+
+    # /route comparisons run as background jobs polled by the page (false computes them inside the request);
+    # the queue lives in JOB_DB_PATH and each process runs JOB_WORKERS jobs at a time
+    ROUTE_JOBS = os.environ.get('ROUTE_JOBS', 'true').lower() == 'true'
+    JOB_DB_PATH = os.environ.get('JOB_DB_PATH') or os.path.join(basedir, 'instance', 'jobs.db')
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 4)
+    JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED') or 200)
+    JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT') or 60)
+    JOB_RETENTION = int(os.environ.get('JOB_RETENTION') or 3600)
+    # Seconds between checks for jobs left queued or timed out by another (possibly dead) process
+    JOB_RECOVERY_INTERVAL = float(os.environ.get('JOB_RECOVERY_INTERVAL') or 5)
+
+    # Batch comparisons use the OSRM table service; the public server caps coordinates per request
+    BATCH_MAX_PAIRS = int(os.environ.get('BATCH_MAX_PAIRS') or 1000)
+    BATCH_DEADLINE = float(os.environ.get('BATCH_DEADLINE') or 30)
+    # Per batch: at most this many addresses missing from the geocode cache are geocoded, within this many seconds
+    BATCH_MAX_GEOCODES = int(os.environ.get('BATCH_MAX_GEOCODES') or 20)
+    BATCH_GEOCODE_DEADLINE = float(os.environ.get('BATCH_GEOCODE_DEADLINE') or 10)
+    OSRM_TABLE_MAX_COORDS = int(os.environ.get('OSRM_TABLE_MAX_COORDS') or 100)
+    OSRM_TABLE_TIMEOUT = float(os.environ.get('OSRM_TABLE_TIMEOUT') or 10)
+
+    # Seconds between autocomplete index catch-ups with newly saved locations and trips
+    AUTOCOMPLETE_SYNC_INTERVAL = float(os.environ.get('AUTOCOMPLETE_SYNC_INTERVAL') or 5)
+
+    # Largest batch accepted by /api/save_routes
+    SAVE_BATCH_MAX = int(os.environ.get('SAVE_BATCH_MAX') or 500)
     
     EMISSIONS = {
         'walking': 0,
@@ -18,4 +126,22 @@ class Config:
         'car_medium': 170,
         'car_large': 220,
         'rideshare': 180,
-    }
\ No newline at end of file
+    }
+
+    # Regional multipliers on EMISSIONS (public transport efficiency, grid cleanliness)
+    REGIONAL_EMISSION_FACTORS = {
+        'europe': 0.9,
+        'usa': 1.1,
+        'asia': 1.05,
+    }
+
+    # Region boundaries (GeoJSON with a 'region' property per feature) and their lookup grid cell size in degrees
+    REGION_BOUNDARIES_PATH = os.environ.get('REGION_BOUNDARIES_PATH') or os.path.join(basedir, 'data', 'regions.geojson')
+    REGION_GRID_DEGREES = float(os.environ.get('REGION_GRID_DEGREES') or 0.5)
+
+    # Per-request phase timing (Server-Timing header and Prometheus histograms at METRICS_PATH)
+    REQUEST_TIMING = os.environ.get('REQUEST_TIMING', 'true').lower() == 'true'
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+    METRICS_PATH = os.environ.get('METRICS_PATH') or '/metrics'
+    # Histogram bucket upper bounds in seconds
+    TIMING_BUCKETS = [float(b) for b in (os.environ.get('TIMING_BUCKETS') or '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10').split(',')]
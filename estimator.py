@@ -0,0 +1,171 @@
+"""
+Straight-line route estimator for Eco-Go
+Road distance and travel time are estimated from the haversine distance,
+scaled by a detour factor and an average speed per routing profile. Both
+are calibrated against the real routes in the route cache and refreshed by a
+background thread (ESTIMATE_CALIBRATE_INTERVAL), so estimates follow the
+roads actually being served.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from cache import route_cache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Used until a profile has enough cached routes to calibrate against
+DEFAULT_DETOUR_FACTORS = {'foot': 1.25, 'bike': 1.3, 'car': 1.35}
+DEFAULT_SPEEDS = {'foot': 5.0, 'bike': 15.0, 'car': 35.0}  # km/h
+
+# Calibrated values are clipped to these bounds, so a few odd routes cannot skew every estimate
+DETOUR_BOUNDS = (1.0, 3.0)
+SPEED_BOUNDS = {'foot': (2.0, 8.0), 'bike': (6.0, 30.0), 'car': (10.0, 120.0)}
+
+# Trips shorter than this (km, straight line) are dominated by snapping noise
+MIN_SAMPLE_KM = 0.5
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; accepts scalars or numpy arrays (broadcast)"""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _parse_route_key(key):
+    """(profile, start lat, start lng, end lat, end lng) from a route_cache_key, or None"""
+    try:
+        _, profile, coords = key.split(':')
+        start, end = coords.split(';')
+        start_lat, start_lng = start.split(',')
+        end_lat, end_lng = end.split(',')
+        return profile, float(start_lat), float(start_lng), float(end_lat), float(end_lng)
+    except ValueError:
+        return None
+
+
+class RouteEstimator:
+    """
+    Per-profile detour factors and speeds, calibrated as the median over
+    cached routes once a profile has `min_samples` of them
+    """
+    def __init__(self, min_samples=20):
+        self.min_samples = min_samples
+        self.detour_factors = dict(DEFAULT_DETOUR_FACTORS)
+        self.speeds = dict(DEFAULT_SPEEDS)
+        self.samples = {}
+        self.calibrated_at = None
+        self._lock = threading.Lock()
+
+    def calibrate(self, entries=None):
+        """
+        Recompute detour factors and speeds from real routes
+
+        Args:
+            entries (list): (route_cache_key, route) pairs; defaults to the route cache
+
+        Returns:
+            dict: Samples used per profile
+        """
+        if entries is None:
+            entries = route_cache.items()
+
+        rows = {}
+        for key, route in entries:
+            if not isinstance(route, dict) or route.get('estimate'):
+                continue
+            if not route.get('distance') or not route.get('duration'):
+                continue
+            parsed = _parse_route_key(key)
+            if parsed is None:
+                continue
+            profile, start_lat, start_lng, end_lat, end_lng = parsed
+            rows.setdefault(profile, []).append(
+                (start_lat, start_lng, end_lat, end_lng, route['distance'], route['duration'])
+            )
+
+        detour_factors, speeds, samples = {}, {}, {}
+        for profile, profile_rows in rows.items():
+            data = np.asarray(profile_rows, dtype=np.float64)
+            crow = haversine_km(data[:, 0], data[:, 1], data[:, 2], data[:, 3])
+            usable = crow >= MIN_SAMPLE_KM
+            samples[profile] = int(usable.sum())
+            if samples[profile] < self.min_samples:
+                continue
+            road, minutes = data[usable, 4], data[usable, 5]
+            detour_factors[profile] = float(np.clip(np.median(road / crow[usable]), *DETOUR_BOUNDS))
+            speeds[profile] = float(np.clip(np.median(road / (minutes / 60)), *SPEED_BOUNDS.get(profile, (2.0, 120.0))))
+
+        with self._lock:
+            self.detour_factors.update(detour_factors)
+            self.speeds.update(speeds)
+            self.samples = samples
+            self.calibrated_at = time.time()
+        return samples
+
+    def _factors(self, profile):
+        with self._lock:
+            return self.detour_factors.get(profile, 1.3), self.speeds.get(profile, 35.0)
+
+    def estimate(self, start, end, profile):
+        """
+        Estimated route between two (lat, lng) points
+
+        Returns:
+            dict: {'distance': km, 'duration': minutes, 'estimate': True}
+        """
+        detour, speed = self._factors(profile)
+        distance = float(haversine_km(start[0], start[1], end[0], end[1])) * detour
+        return {
+            'distance': round(distance, 2),
+            'duration': round(distance / speed * 60),
+            'estimate': True
+        }
+
+    def table(self, sources, destinations, profile):
+        """Estimated distance (km) and duration (minutes) matrices, computed in one vectorized pass"""
+        detour, speed = self._factors(profile)
+        src = np.asarray(sources, dtype=np.float64).reshape(-1, 2)
+        dst = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+        distances = haversine_km(src[:, None, 0], src[:, None, 1], dst[None, :, 0], dst[None, :, 1]) * detour
+        durations = distances / speed * 60
+        return {
+            'distances': np.round(distances, 2).tolist(),
+            'durations': np.round(durations).astype(int).tolist(),
+            'estimate': True
+        }
+
+    def status(self):
+        with self._lock:
+            return {
+                'detour_factors': {profile: round(value, 3) for profile, value in self.detour_factors.items()},
+                'speeds_kmh': {profile: round(value, 1) for profile, value in self.speeds.items()},
+                'samples': dict(self.samples),
+                'calibrated_at': self.calibrated_at,
+            }
+
+
+estimator = RouteEstimator(min_samples=Config.ESTIMATE_MIN_SAMPLES)
+
+
+def start_estimator_calibration():
+    """Recalibrate the estimator from the route cache every ESTIMATE_CALIBRATE_INTERVAL seconds"""
+    interval = Config.ESTIMATE_CALIBRATE_INTERVAL
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            try:
+                estimator.calibrate()
+            except Exception:
+                logger.exception('Estimator calibration failed')
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='estimator-calibration', daemon=True)
+    thread.start()
+    return thread
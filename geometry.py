@@ -0,0 +1,143 @@
+"""
+Route geometry helpers for Eco-Go
+Encoded polylines (Google polyline5 / OSRM polyline6) and Douglas-Peucker simplification
+"""
+import math
+
+EARTH_CIRCUMFERENCE_M = 40075016.686
+METERS_PER_DEGREE = 111320
+TILE_SIZE = 256
+# Highest web-map zoom level (street level) the geometry endpoints accept
+MAX_ZOOM = 18
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decode an encoded polyline string
+
+    Args:
+        encoded (str): Encoded polyline
+        precision (int): 5 for Google polyline, 6 for OSRM polyline6
+
+    Returns:
+        list: [(lat, lng), ...]
+    """
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+
+    return points
+
+
+def encode_polyline(points, precision=5):
+    """
+    Encode [(lat, lng), ...] as a polyline string
+
+    Args:
+        points (list): Sequence of (lat, lng) pairs
+        precision (int): 5 for Google polyline, 6 for OSRM polyline6
+
+    Returns:
+        str: Encoded polyline
+    """
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lng = 0
+
+    for lat, lng in points:
+        lat_i = int(round(lat * factor))
+        lng_i = int(round(lng * factor))
+        for delta in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+
+    return ''.join(chunks)
+
+
+def simplify(points, tolerance):
+    """
+    Douglas-Peucker line simplification
+
+    Longitude is scaled by cos(latitude) so the tolerance is treated the same
+    in both directions.
+
+    Args:
+        points (list): [(lat, lng), ...]
+        tolerance (float): Maximum allowed deviation in degrees of latitude
+
+    Returns:
+        list: Simplified [(lat, lng), ...] keeping both endpoints
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    scale = math.cos(math.radians(sum(p[0] for p in points) / len(points)))
+    xy = [(p[1] * scale, p[0]) for p in points]
+    tolerance_sq = tolerance * tolerance
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        seg_len_sq = dx * dx + dy * dy
+
+        max_dist_sq = 0
+        max_index = None
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if seg_len_sq == 0:
+                dist_sq = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                t = max(0, min(1, ((px - ax) * dx + (py - ay) * dy) / seg_len_sq))
+                dist_sq = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                max_index = i
+
+        if max_index is not None and max_dist_sq > tolerance_sq:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def tolerance_for_zoom(zoom, latitude=0, pixels=1):
+    """Simplification tolerance in degrees matching `pixels` screen pixels at a web-map zoom level"""
+    meters_per_pixel = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(latitude)) / (TILE_SIZE * 2 ** zoom)
+    return pixels * meters_per_pixel / METERS_PER_DEGREE
+
+
+def zoom_for_bounds(start, end, map_pixels=800, max_zoom=MAX_ZOOM):
+    """Approximate the zoom level at which the box around two points fills the map"""
+    lat_span = abs(start[0] - end[0])
+    lng_span = abs(start[1] - end[1]) * math.cos(math.radians((start[0] + end[0]) / 2))
+    span = max(lat_span, lng_span, 1e-6)
+    zoom = math.log2(360 * map_pixels / (TILE_SIZE * span))
+    return max(0, min(max_zoom, int(zoom)))
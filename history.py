@@ -0,0 +1,216 @@
+"""
+Saved-route history for Eco-Go
+Batched writes of trips and keyset-paginated reads of a user's SavedRoute
+rows joined with their Route
+"""
+import math
+from datetime import datetime, timezone
+from sqlalchemy import insert, tuple_
+from extensions import db
+from cache import normalize_address
+from locations import intern_locations
+from models import Route, SavedRoute, insert_ignore
+from stats import record_trips
+
+MAX_PAGE_SIZE = 100
+
+
+def parse_trip(data):
+    """
+    Validate one trip from a save request
+
+    Args:
+        data (dict): start, end, distance, transport_mode, carbon_saved and
+            optionally date_saved (ISO 8601, defaults to now)
+
+    Returns:
+        dict: Cleaned trip; a negative carbon_saved is clamped to 0
+
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Trip must be an object')
+
+    start = str(data.get('start') or '').strip()
+    end = str(data.get('end') or '').strip()
+    transport_mode = str(data.get('transport_mode') or '').strip()
+    if not normalize_address(start) or not normalize_address(end):
+        raise ValueError('Missing start or end')
+    if len(start) > 128 or len(end) > 128:
+        raise ValueError('Locations must be at most 128 characters')
+    if not transport_mode or len(transport_mode) > 64:
+        raise ValueError('Missing or invalid transport_mode')
+
+    try:
+        distance = float(data.get('distance'))
+        carbon_saved = float(data.get('carbon_saved'))
+    except (TypeError, ValueError):
+        raise ValueError('distance and carbon_saved must be numbers')
+    # NaN or infinity would poison the incrementally maintained stats for good
+    if not math.isfinite(distance) or not math.isfinite(carbon_saved):
+        raise ValueError('distance and carbon_saved must be finite numbers')
+    if distance < 0:
+        raise ValueError('distance must not be negative')
+    # A trip never saves less than nothing, as on the comparison page
+    carbon_saved = max(0.0, carbon_saved)
+
+    date_saved = datetime.utcnow()
+    if data.get('date_saved'):
+        date_saved = datetime.fromisoformat(str(data['date_saved']).replace('Z', '+00:00'))
+        if date_saved.tzinfo:
+            date_saved = date_saved.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        'start': start,
+        'end': end,
+        'distance': distance,
+        'transport_mode': transport_mode,
+        'carbon_saved': carbon_saved,
+        'date_saved': date_saved
+    }
+
+
+def save_trips(user_id, trips):
+    """
+    Save many trips for a user in one transaction
+
+    Addresses are interned as Locations, distinct location pairs are upserted
+    into Route, every SavedRoute row is
+    inserted with one bulk statement, and the user's stats and rollups are
+    updated before the single commit.
+
+    Args:
+        user_id (int): Owner of the trips
+        trips (list): Trips from parse_trip
+
+    Returns:
+        list: New SavedRoute ids, in the same order as trips
+    """
+    if not trips:
+        return []
+
+    try:
+        locations = intern_locations(
+            [trip['start'] for trip in trips] + [trip['end'] for trip in trips]
+        )
+        new_routes = {}
+        for trip in trips:
+            start, end = locations[trip['start']], locations[trip['end']]
+            new_routes.setdefault((start.id, end.id), {
+                'start_location_id': start.id,
+                'end_location_id': end.id,
+                'start_location': start.name,
+                'end_location': end.name,
+                'distance': trip['distance']
+            })
+        insert_ignore(Route, list(new_routes.values()))
+        route_ids = {
+            (start_id, end_id): route_id
+            for route_id, start_id, end_id in db.session.query(Route.id, Route.start_location_id, Route.end_location_id)
+            .filter(tuple_(Route.start_location_id, Route.end_location_id).in_(list(new_routes)))
+        }
+
+        saved_ids = db.session.scalars(
+            insert(SavedRoute).returning(SavedRoute.id, sort_by_parameter_order=True),
+            [
+                {
+                    'user_id': user_id,
+                    'route_id': route_ids[(locations[trip['start']].id, locations[trip['end']].id)],
+                    'transport_mode': trip['transport_mode'],
+                    'carbon_saved': trip['carbon_saved'],
+                    'date_saved': trip['date_saved']
+                }
+                for trip in trips
+            ]
+        ).all()
+
+        record_trips(user_id, [
+            (trip['transport_mode'], trip['carbon_saved'], trip['date_saved']) for trip in trips
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return saved_ids
+
+
+def encode_cursor(date_saved, saved_route_id):
+    """Opaque cursor pointing just past a row"""
+    return f'{date_saved.isoformat()}_{saved_route_id}'
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor from encode_cursor
+
+    Returns:
+        tuple: (date_saved, saved_route_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    date_part, _, id_part = cursor.rpartition('_')
+    return datetime.fromisoformat(date_part), int(id_part)
+
+
+def get_saved_routes_page(user_id, limit=20, cursor=None, ascending=False):
+    """
+    One page of a user's saved routes, newest first unless ascending
+
+    Args:
+        user_id (int): Owner of the routes
+        limit (int): Page size, capped at MAX_PAGE_SIZE
+        cursor (str, optional): next_cursor from the previous page
+        ascending (bool): Oldest first instead of newest first
+
+    Returns:
+        dict: 'routes' as compact rows and 'next_cursor' (None on the last page)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(SavedRoute.date_saved, SavedRoute.id)
+
+    query = db.session.query(
+        SavedRoute.id,
+        SavedRoute.date_saved,
+        SavedRoute.transport_mode,
+        SavedRoute.carbon_saved,
+        Route.start_location,
+        Route.end_location,
+        Route.distance
+    )\
+    .outerjoin(Route, SavedRoute.route_id == Route.id)\
+    .filter(SavedRoute.user_id == user_id)
+
+    if cursor:
+        position = decode_cursor(cursor)
+        query = query.filter(key > position if ascending else key < position)
+
+    if ascending:
+        query = query.order_by(SavedRoute.date_saved.asc(), SavedRoute.id.asc())
+    else:
+        query = query.order_by(SavedRoute.date_saved.desc(), SavedRoute.id.desc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        'routes': [
+            {
+                'id': row.id,
+                'date': row.date_saved.strftime('%Y-%m-%d'),
+                'start': row.start_location,
+                'end': row.end_location,
+                'distance': row.distance,
+                'mode': row.transport_mode,
+                'carbon_saved': row.carbon_saved
+            }
+            for row in rows
+        ],
+        'next_cursor': encode_cursor(rows[-1].date_saved, rows[-1].id) if has_more else None
+    }
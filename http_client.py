@@ -0,0 +1,229 @@
+"""
+Outbound HTTP client for Eco-Go
+One pooled keep-alive requests.Session for every upstream call, with per-host
+concurrency caps and rate limits. Rate limits are shared by every worker
+process through the SQLite cache file when one is configured, so Nominatim's
+1 request/second policy holds across the whole deployment.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+
+class RateLimitedError(requests.RequestException):
+    """A request could not get a concurrency slot or rate-limit token within HTTP_MAX_QUEUE_WAIT"""
+
+
+class LocalRateLimiter:
+    """
+    In-process token bucket, implemented as GCRA: each key stores the
+    theoretical arrival time of the next request, and up to `burst` requests
+    may run ahead of it.
+    """
+    def __init__(self):
+        self._tat = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key, interval, burst, max_wait):
+        """
+        Reserve the next slot for a key
+
+        Returns:
+            float: Seconds to wait before sending, or None if that exceeds max_wait
+            (in which case nothing is reserved)
+        """
+        with self._lock:
+            now = time.time()
+            tat = max(self._tat.get(key, now), now) + interval
+            wait = max(0.0, tat - burst * interval - now)
+            if wait > max_wait:
+                return None
+            self._tat[key] = tat
+            return wait
+
+
+class SQLiteRateLimiter:
+    """
+    GCRA token bucket stored in a SQLite file, shared by every process that opens it.
+    Falls back to the in-process limiter if the database is unusable.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._fallback = LocalRateLimiter()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                ' key TEXT PRIMARY KEY,'
+                ' tat REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key, interval, burst, max_wait):
+        try:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front, serializing reservations across processes
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+                now = time.time()
+                tat = max(row[0] if row else now, now) + interval
+                wait = max(0.0, tat - burst * interval - now)
+                if wait > max_wait:
+                    conn.execute('ROLLBACK')
+                    return None
+                conn.execute('INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)', (key, tat))
+                conn.execute('COMMIT')
+                return wait
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            return self._fallback.reserve(key, interval, burst, max_wait)
+
+
+class HostStats:
+    """Request counts and queue-wait times (seconds) for one upstream host"""
+    def __init__(self, window=500):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._waits.append(seconds)
+
+    def record_done(self, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += error
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            snapshot = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'queue_wait_mean_ms': round(self.total_wait / self.requests * 1000, 2) if self.requests else None,
+                'queue_wait_max_ms': round(self.max_wait * 1000, 2),
+            }
+        snapshot['queue_wait_p95_ms'] = round(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000, 2) if waits else None
+        return snapshot
+
+
+class HTTPClient:
+    """
+    Shared keep-alive session with per-host limits from Config.HTTP_HOST_LIMITS
+
+    Each request first takes one of the host's concurrency slots, then waits
+    for a rate-limit token; the time spent on both is recorded as queue wait.
+    """
+    def __init__(self, pool_size=10, host_limits=None, rate_limit_path=None, max_queue_wait=10):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = 'eco-route-app'
+        self.host_limits = host_limits or {}
+        self.max_queue_wait = max_queue_wait
+        self.limiter = SQLiteRateLimiter(rate_limit_path) if rate_limit_path else LocalRateLimiter()
+        self._slots = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, host):
+        limits = dict(self.host_limits.get('default', {}))
+        limits.update(self.host_limits.get(host, {}))
+        return limits
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._stats:
+                self._slots[host] = threading.BoundedSemaphore(self._limits(host).get('concurrency', 8))
+                self._stats[host] = HostStats()
+            return self._slots[host], self._stats[host]
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the host's concurrency cap and rate limit
+
+        Raises:
+            RateLimitedError: No slot or token within max_queue_wait seconds
+            requests.RequestException: The request itself failed
+        """
+        host = urlparse(url).hostname or ''
+        limits = self._limits(host)
+        slots, stats = self._host_state(host)
+
+        queued_at = time.perf_counter()
+        if not slots.acquire(timeout=self.max_queue_wait):
+            stats.record_rejected()
+            raise RateLimitedError(f'No free connection slot for {host}')
+        try:
+            rate = limits.get('rate')
+            if rate:
+                remaining = self.max_queue_wait - (time.perf_counter() - queued_at)
+                wait = self.limiter.reserve(host, 1.0 / rate, limits.get('burst', 1), max(remaining, 0))
+                if wait is None:
+                    stats.record_rejected()
+                    raise RateLimitedError(f'Rate limit for {host} exceeded')
+                if wait:
+                    time.sleep(wait)
+            stats.record_wait(time.perf_counter() - queued_at)
+
+            error = True
+            try:
+                response = self.session.request(method, url, **kwargs)
+                error = response.status_code >= 500 or response.status_code == 429
+                return response
+            finally:
+                stats.record_done(error)
+        finally:
+            slots.release()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Per-host request, error and queue-wait counters for this process"""
+        with self._lock:
+            hosts = dict(self._stats)
+        return {host: host_stats.snapshot() for host, host_stats in hosts.items()}
+
+
+http_client = HTTPClient(
+    pool_size=Config.HTTP_POOL_SIZE,
+    host_limits=Config.HTTP_HOST_LIMITS,
+    rate_limit_path=Config.CACHE_DB_PATH if Config.HTTP_SHARED_RATE_LIMIT else None,
+    max_queue_wait=Config.HTTP_MAX_QUEUE_WAIT
+)
@@ -0,0 +1,252 @@
+"""
+Background jobs for Eco-Go
+Slow work (route comparisons) is queued in a SQLite table and run by a small
+per-process thread pool, so web workers return immediately and clients poll
+for the result. Identical jobs that are still queued or running are
+coalesced onto one job id.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFullError(Exception):
+    """Too many jobs are waiting; the client should retry later"""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a bounded worker pool
+
+    Every process that opens the same file shares the queue: a job is claimed
+    inside a write transaction, so exactly one worker runs it. Jobs left
+    running longer than `timeout` (e.g. by a killed process) are re-queued,
+    and a recovery thread picks up queued jobs no submit is running (e.g.
+    orphaned by a restart), so they finish without new traffic.
+    """
+    def __init__(self, path, workers=4, max_queued=200, timeout=60, retention=3600):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.retention = retention
+        self.handlers = {}
+        self.app = None
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._submits = 0
+        self._recovery = None
+
+    def init_app(self, app, recovery_interval=None):
+        """
+        Run handlers inside this app's context and start the recovery thread
+
+        Args:
+            app (Flask): App whose context handlers run in
+            recovery_interval (float): Seconds between checks for runnable jobs
+                (default Config.JOB_RECOVERY_INTERVAL; 0 disables the thread)
+        """
+        self.app = app
+        interval = Config.JOB_RECOVERY_INTERVAL if recovery_interval is None else recovery_interval
+        if interval <= 0:
+            return
+
+        def run():
+            while True:
+                try:
+                    # At most one recovery pass waits in the pool at a time
+                    if (self._recovery is None or self._recovery.done()) and self._has_runnable():
+                        self._recovery = self._pool.submit(self._run_next)
+                except sqlite3.Error:
+                    logger.exception('Job recovery check failed')
+                time.sleep(interval)
+
+        threading.Thread(target=run, name='job-recovery', daemon=True).start()
+
+    def register(self, kind, handler):
+        """handler(params) -> JSON-serializable result; raise ValueError for a user-facing failure"""
+        self.handlers[kind] = handler
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' kind TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' params TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' started_at REAL,'
+                ' finished_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_key_status ON jobs (key, status)')
+            self._local.conn = conn
+        return conn
+
+    def submit(self, kind, params, key=None):
+        """
+        Queue a job, or join an identical one that is still queued or running
+
+        Args:
+            kind (str): Registered handler name
+            params (dict): JSON-serializable handler arguments
+            key (str): Coalescing key; defaults to kind + params
+
+        Returns:
+            tuple: (job dict, True if a new job was created)
+
+        Raises:
+            QueueFullError: max_queued jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise KeyError(f'No handler registered for job kind {kind!r}')
+        key = f"{kind}:{key if key is not None else json.dumps(params, sort_keys=True)}"
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = conn.execute(
+                'SELECT * FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1',
+                (key, QUEUED, RUNNING)
+            ).fetchone()
+            if existing is not None:
+                conn.execute('COMMIT')
+                return self._to_dict(existing), False
+
+            queued = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f'{queued} jobs already queued')
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                'INSERT INTO jobs (id, kind, key, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, kind, key, json.dumps(params), QUEUED, time.time())
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._submits += 1
+        if self._submits % 100 == 0:
+            self.purge()
+        self._pool.submit(self._run_next)
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        """Job as a dict (params/result decoded), or None if unknown or purged"""
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        del job['key']
+        return job
+
+    def _claim(self):
+        """Atomically mark the oldest runnable job as running and return it"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? OR (status = ? AND started_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (QUEUED, RUNNING, now - self.timeout)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?', (RUNNING, now, row['id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _has_runnable(self):
+        row = self._connect().execute(
+            'SELECT 1 FROM jobs WHERE status = ? OR (status = ? AND started_at < ?) LIMIT 1',
+            (QUEUED, RUNNING, time.time() - self.timeout)
+        ).fetchone()
+        return row is not None
+
+    def _finish(self, job_id, result=None, error=None):
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+            (FAILED if error else DONE, None if error else json.dumps(result), error, time.time(), job_id)
+        )
+
+    def _run_next(self):
+        """Run claimed jobs until none are runnable"""
+        while True:
+            try:
+                row = self._claim()
+            except sqlite3.Error:
+                logger.exception('Could not claim a job')
+                return
+            if row is None:
+                return
+            self._run(row)
+
+    def _run(self, row):
+        handler = self.handlers.get(row['kind'])
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job kind {row['kind']!r}")
+            params = json.loads(row['params'])
+            if self.app is not None:
+                with self.app.app_context():
+                    result = handler(params)
+            else:
+                result = handler(params)
+            self._finish(row['id'], result=result)
+        except ValueError as e:
+            self._finish(row['id'], error=str(e))
+        except Exception:
+            logger.exception('Job %s failed', row['id'])
+            self._finish(row['id'], error='Internal error')
+
+    def purge(self):
+        """Delete finished jobs older than `retention` seconds"""
+        try:
+            self._connect().execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?',
+                (DONE, FAILED, time.time() - self.retention)
+            )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        rows = self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+
+job_queue = JobQueue(
+    Config.JOB_DB_PATH,
+    workers=Config.JOB_WORKERS,
+    max_queued=Config.JOB_MAX_QUEUED,
+    timeout=Config.JOB_TIMEOUT,
+    retention=Config.JOB_RETENTION
+)
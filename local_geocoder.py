@@ -0,0 +1,325 @@
+"""
+Offline geocoder for Eco-Go
+Resolves place names from a gazetteer (CSV or OSM places extract) preprocessed
+into a sorted array of normalized names, memory-mapped from disk. Lookups are a
+binary search, so they cost microseconds rather than a Nominatim round trip.
+"""
+import bisect
+import csv
+import json
+import math
+import os
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from cache import normalize_address
+from config import Config
+
+GAZETTEER_FORMAT_VERSION = 1
+
+# Ranking used for OSM places that carry no population tag
+PLACE_POPULATION = {
+    'city': 100000, 'town': 10000, 'suburb': 5000, 'village': 1000,
+    'quarter': 1000, 'neighbourhood': 500, 'hamlet': 100, 'locality': 10,
+}
+
+# Prefix lookups stop ranking after this many matching names
+MAX_PREFIX_SCAN = 5000
+
+# Grid cell size (degrees) of the reverse-geocoding index
+INDEX_CELL_SIZE = 0.1
+
+GAZETTEER_ARRAYS = (
+    'key_bytes', 'key_offsets', 'key_places',
+    'place_lat', 'place_lng', 'place_population',
+    'label_bytes', 'label_offsets', 'cell_keys', 'cell_places'
+)
+
+CSV_COLUMNS = {
+    'lat': ('lat', 'latitude'),
+    'lng': ('lng', 'lon', 'longitude'),
+}
+
+
+def _read_csv_places(path):
+    """
+    Places from a CSV with name, lat, lng columns and optional population,
+    country and '|'-separated alternate_names
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fields = {name.lower(): name for name in reader.fieldnames or []}
+        lat_col = next((fields[c] for c in CSV_COLUMNS['lat'] if c in fields), None)
+        lng_col = next((fields[c] for c in CSV_COLUMNS['lng'] if c in fields), None)
+        if 'name' not in fields or not lat_col or not lng_col:
+            raise ValueError(f'{path} needs name, lat and lng columns')
+        for row in reader:
+            try:
+                lat, lng = float(row[lat_col]), float(row[lng_col])
+            except (TypeError, ValueError):
+                continue
+            alternates = row.get(fields.get('alternate_names', ''), '') or ''
+            yield {
+                'name': row[fields['name']].strip(),
+                'lat': lat,
+                'lng': lng,
+                'population': int(float(row.get(fields.get('population', ''), 0) or 0)),
+                'country': (row.get(fields.get('country', ''), '') or '').strip(),
+                'alternates': [name.strip() for name in alternates.split('|') if name.strip()],
+            }
+
+
+def _read_osm_places(path):
+    """Places from place=* nodes in an OSM XML extract"""
+    tags = {}
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'tag':
+            tags[elem.get('k')] = elem.get('v')
+        elif elem.tag == 'node':
+            place = tags.get('place')
+            if place and tags.get('name'):
+                try:
+                    population = int(float(tags.get('population', '').replace(',', '')))
+                except ValueError:
+                    population = PLACE_POPULATION.get(place, 0)
+                alternates = [tags[k] for k in ('name:en', 'int_name', 'official_name') if tags.get(k)]
+                alternates += [name.strip() for name in tags.get('alt_name', '').split(';') if name.strip()]
+                yield {
+                    'name': tags['name'],
+                    'lat': float(elem.get('lat')),
+                    'lng': float(elem.get('lon')),
+                    'population': population,
+                    'country': tags.get('is_in:country', ''),
+                    'alternates': alternates,
+                }
+            tags = {}
+            elem.clear()
+        elif elem.tag in ('way', 'relation'):
+            tags = {}
+            elem.clear()
+
+
+def _pack_strings(strings):
+    """Concatenate UTF-8 strings into (uint8 blob, int64 offsets)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8).copy(), offsets
+
+
+def _cell_keys(lats, lngs, cell_size):
+    """Pack (row, col) grid cells into sortable int64 keys"""
+    rows = np.floor((np.asarray(lats, dtype=np.float64) + 90) / cell_size).astype(np.int64)
+    cols = np.floor((np.asarray(lngs, dtype=np.float64) + 180) / cell_size).astype(np.int64)
+    return rows * 1000000 + cols
+
+
+def build_gazetteer(source_path, output_dir, cell_size=INDEX_CELL_SIZE):
+    """
+    Preprocess a gazetteer into the on-disk index
+
+    Each place is indexed under its normalized name, every alternate name and
+    "name country", so "Paris, France" and "Paris" both resolve.
+
+    Args:
+        source_path (str): .csv gazetteer or .osm places extract
+        output_dir (str): Directory to write the index into
+        cell_size (float): Reverse-geocoding grid cell size in degrees
+
+    Returns:
+        dict: Index metadata (place/name counts)
+    """
+    if source_path.lower().endswith('.csv'):
+        places = list(_read_csv_places(source_path))
+    else:
+        places = list(_read_osm_places(source_path))
+    if not places:
+        raise ValueError(f'No places found in {source_path}')
+
+    entries = set()
+    for index, place in enumerate(places):
+        for name in [place['name']] + place['alternates']:
+            key = normalize_address(name)
+            if key:
+                entries.add((key, index))
+                if place['country']:
+                    entries.add((normalize_address(f"{name} {place['country']}"), index))
+
+    # Byte order of UTF-8 matches code point order, so sorting strings sorts the blob
+    entries = sorted(entries, key=lambda entry: (entry[0], -places[entry[1]]['population']))
+    key_bytes, key_offsets = _pack_strings([key for key, _ in entries])
+    labels = [', '.join(filter(None, (p['name'], p['country']))) for p in places]
+    label_bytes, label_offsets = _pack_strings(labels)
+
+    lats = np.array([p['lat'] for p in places], dtype=np.float64)
+    lngs = np.array([p['lng'] for p in places], dtype=np.float64)
+    cells = _cell_keys(lats, lngs, cell_size)
+    cell_order = np.argsort(cells, kind='stable')
+
+    arrays = {
+        'key_bytes': key_bytes,
+        'key_offsets': key_offsets,
+        'key_places': np.array([index for _, index in entries], dtype=np.int32),
+        'place_lat': lats,
+        'place_lng': lngs,
+        'place_population': np.array([p['population'] for p in places], dtype=np.int64),
+        'label_bytes': label_bytes,
+        'label_offsets': label_offsets,
+        'cell_keys': cells[cell_order],
+        'cell_places': cell_order.astype(np.int32),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f'{name}.npy'), array)
+
+    meta = {
+        'version': GAZETTEER_FORMAT_VERSION,
+        'source': os.path.basename(source_path),
+        'places': len(places),
+        'names': len(entries),
+        'cell_size': cell_size,
+    }
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class _SortedKeys:
+    """Read-only sequence view of the packed key blob, so bisect can search it in place"""
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+
+class LocalGeocoder:
+    """
+    Name and nearest-place lookups over an index built by build_gazetteer
+    """
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != GAZETTEER_FORMAT_VERSION:
+            raise ValueError(f'Unsupported gazetteer format in {index_dir}, rebuild it with `flask build-gazetteer`')
+        for name in GAZETTEER_ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r'))
+        self.keys = _SortedKeys(self.key_bytes, self.key_offsets)
+        self.cell_size = self.meta['cell_size']
+
+    def _key_range(self, key, prefix=False):
+        lo = bisect.bisect_left(self.keys, key)
+        # Code points above every normalized character close the prefix range
+        hi = bisect.bisect_right(self.keys, key + '\U0010ffff' if prefix else key, lo)
+        return lo, hi
+
+    def _place(self, index):
+        index = int(index)
+        label = self.label_bytes[self.label_offsets[index]:self.label_offsets[index + 1]]
+        return {
+            'name': label.tobytes().decode('utf-8'),
+            'lat': float(self.place_lat[index]),
+            'lng': float(self.place_lng[index]),
+            'population': int(self.place_population[index]),
+        }
+
+    def lookup(self, name):
+        """
+        Most populous place whose normalized name equals `name`
+
+        Returns:
+            tuple: (lat, lng), or None
+        """
+        key = normalize_address(name)
+        if not key:
+            return None
+        lo, hi = self._key_range(key)
+        if lo == hi:
+            return None
+        # Entries sharing a key are stored most populous first
+        index = int(self.key_places[lo])
+        return (float(self.place_lat[index]), float(self.place_lng[index]))
+
+    def search(self, prefix, limit=10):
+        """
+        Places whose name starts with `prefix`, most populous first
+
+        Returns:
+            list: [{'name', 'lat', 'lng', 'population'}, ...]
+        """
+        key = normalize_address(prefix)
+        if not key:
+            return []
+        lo, hi = self._key_range(key, prefix=True)
+        places = np.unique(np.asarray(self.key_places[lo:min(hi, lo + MAX_PREFIX_SCAN)]))
+        if not len(places):
+            return []
+        ranked = places[np.argsort(-self.place_population[places], kind='stable')][:limit]
+        return [self._place(index) for index in ranked]
+
+    def geocode(self, address):
+        """
+        Resolve a free-text address that names a gazetteer place exactly
+
+        Partial matches (a single comma part, a name prefix) are left to
+        search() so the next geocoder provider gets queries the gazetteer
+        cannot answer precisely.
+
+        Returns:
+            tuple: (lat, lng), or None if no place has exactly this name
+        """
+        return self.lookup(address)
+
+    def reverse(self, coords, max_rings=3):
+        """
+        Nearest gazetteer place to a (lat, lng) point
+
+        Returns:
+            dict: {'name', 'lat', 'lng', 'population', 'distance_km'}, or None
+            if nothing lies within max_rings grid cells
+        """
+        lat, lng = coords
+        row = int(math.floor((lat + 90) / self.cell_size))
+        col = int(math.floor((lng + 180) / self.cell_size))
+        candidates = []
+        for r in range(row - max_rings, row + max_rings + 1):
+            lo = np.searchsorted(self.cell_keys, r * 1000000 + col - max_rings, side='left')
+            hi = np.searchsorted(self.cell_keys, r * 1000000 + col + max_rings, side='right')
+            if hi > lo:
+                candidates.append(np.asarray(self.cell_places[lo:hi]))
+        if not candidates:
+            return None
+        places = np.concatenate(candidates)
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2, lng2 = np.radians(self.place_lat[places]), np.radians(self.place_lng[places])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        distances = 2 * 6371.0088 * np.arcsin(np.sqrt(a))
+        nearest = int(np.argmin(distances))
+        place = self._place(places[nearest])
+        place['distance_km'] = round(float(distances[nearest]), 3)
+        return place
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_local_geocoder():
+    """Process-wide LocalGeocoder for Config.LOCAL_GAZETTEER_PATH, or None if no index is built"""
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None and os.path.exists(os.path.join(Config.LOCAL_GAZETTEER_PATH, 'meta.json')):
+                _geocoder = LocalGeocoder(Config.LOCAL_GAZETTEER_PATH)
+    return _geocoder
+
+
+def local_geocode(address):
+    """(lat, lng) for an address from the local gazetteer, or None"""
+    geocoder = get_local_geocoder()
+    return geocoder.geocode(address) if geocoder else None
+
@@ -0,0 +1,418 @@
+"""
+Offline routing engine for Eco-Go
+Answers foot/bike/car queries with A* over a road graph preprocessed from an
+OSM extract into memory-mapped NumPy arrays (CSR adjacency), so the app does
+not depend on the public OSRM demo server.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from config import Config
+from geometry import encode_polyline
+
+GRAPH_FORMAT_VERSION = 1
+EARTH_RADIUS_M = 6371008.8
+
+# Access bits stored per edge and OR-ed per node
+FOOT, BIKE, CAR = 1, 2, 4
+PROFILE_BITS = {'foot': FOOT, 'bike': BIKE, 'car': CAR}
+
+# Travel speeds in km/h; car speeds come from the edge, walking and cycling are constant
+PROFILE_SPEEDS = {'foot': 5.0, 'bike': 15.0}
+
+# highway=* -> (default access bits, default car speed km/h)
+HIGHWAY_TYPES = {
+    'motorway': (CAR, 110), 'motorway_link': (CAR, 60),
+    'trunk': (FOOT | BIKE | CAR, 90), 'trunk_link': (FOOT | BIKE | CAR, 50),
+    'primary': (FOOT | BIKE | CAR, 65), 'primary_link': (FOOT | BIKE | CAR, 45),
+    'secondary': (FOOT | BIKE | CAR, 55), 'secondary_link': (FOOT | BIKE | CAR, 40),
+    'tertiary': (FOOT | BIKE | CAR, 45), 'tertiary_link': (FOOT | BIKE | CAR, 35),
+    'unclassified': (FOOT | BIKE | CAR, 35), 'residential': (FOOT | BIKE | CAR, 30),
+    'living_street': (FOOT | BIKE | CAR, 10), 'service': (FOOT | BIKE | CAR, 20),
+    'road': (FOOT | BIKE | CAR, 30), 'track': (FOOT | BIKE, 0),
+    'cycleway': (FOOT | BIKE, 0), 'path': (FOOT | BIKE, 0),
+    'footway': (FOOT, 0), 'pedestrian': (FOOT, 0), 'steps': (FOOT, 0),
+}
+
+# Tags that switch a single profile on or off
+ACCESS_TAGS = {'foot': FOOT, 'bicycle': BIKE, 'motor_vehicle': CAR, 'motorcar': CAR}
+DENY_VALUES = {'no', 'private'}
+ALLOW_VALUES = {'yes', 'designated', 'permissive', 'destination'}
+
+# Grid cell size (degrees) of the nearest-node index
+INDEX_CELL_SIZE = 0.01
+# Give up snapping a point further than this from the graph
+MAX_SNAP_METERS = 2000
+
+GRAPH_ARRAYS = (
+    'node_lat', 'node_lng', 'node_access', 'offsets', 'targets',
+    'lengths', 'car_speeds', 'access', 'cell_keys', 'cell_nodes'
+)
+
+
+def _haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; works on scalars or NumPy arrays"""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _parse_maxspeed(value):
+    """'50', '30 mph' -> km/h, or None when not a plain number"""
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', value or '')
+    if not match:
+        return None
+    speed = float(match.group(1))
+    return speed * 1.609344 if match.group(2) else speed
+
+
+def _way_rules(tags):
+    """
+    Access and car speed for an OSM way
+
+    Returns:
+        tuple: (forward access bits, backward access bits, car speed km/h),
+        or None when the way is not routable
+    """
+    highway = tags.get('highway')
+    if highway not in HIGHWAY_TYPES:
+        return None
+    access, car_speed = HIGHWAY_TYPES[highway]
+
+    if tags.get('access') in DENY_VALUES:
+        access = 0
+    for tag, bit in ACCESS_TAGS.items():
+        value = tags.get(tag)
+        if value in DENY_VALUES:
+            access &= ~bit
+        elif value in ALLOW_VALUES:
+            access |= bit
+    if not access:
+        return None
+
+    if access & CAR:
+        car_speed = _parse_maxspeed(tags.get('maxspeed')) or car_speed or 30
+
+    forward = backward = access
+    oneway = tags.get('oneway', 'yes' if tags.get('junction') == 'roundabout' or highway == 'motorway' else 'no')
+    if oneway in ('yes', '1', 'true', '-1'):
+        # Pedestrians may walk both ways; cyclists only if oneway:bicycle=no
+        restricted = CAR | (0 if tags.get('oneway:bicycle') == 'no' else BIKE)
+        if oneway == '-1':
+            forward &= ~restricted
+        else:
+            backward &= ~restricted
+    return forward, backward, car_speed
+
+
+def build_graph(osm_path, output_dir, cell_size=INDEX_CELL_SIZE):
+    """
+    Preprocess an OSM XML extract into the on-disk graph format
+
+    Every array is written as its own .npy file so LocalRouter can memory-map
+    it; worker processes then share the same physical pages.
+
+    Args:
+        osm_path (str): OSM XML file (.osm)
+        output_dir (str): Directory to write the graph into
+        cell_size (float): Nearest-node index cell size in degrees
+
+    Returns:
+        dict: Graph metadata (node/edge counts, bounds)
+    """
+    node_coords = {}
+    ways = []
+    tags = {}
+    refs = []
+    for _, elem in ET.iterparse(osm_path, events=('end',)):
+        if elem.tag == 'node':
+            node_coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+        elif elem.tag == 'nd':
+            refs.append(int(elem.get('ref')))
+        elif elem.tag == 'tag':
+            tags[elem.get('k')] = elem.get('v')
+        elif elem.tag == 'way':
+            rules = _way_rules(tags)
+            if rules and len(refs) > 1:
+                ways.append((refs, rules))
+            tags, refs = {}, []
+            elem.clear()
+        elif elem.tag == 'relation':
+            tags, refs = {}, []
+            elem.clear()
+
+    # Keep only nodes that are on a routable way, renumbered 0..n-1
+    node_ids = {}
+    for way_refs, _ in ways:
+        for ref in way_refs:
+            if ref in node_coords and ref not in node_ids:
+                node_ids[ref] = len(node_ids)
+    if not node_ids:
+        raise ValueError(f'No routable ways found in {osm_path}')
+
+    coords = np.empty((len(node_ids), 2), dtype=np.float64)
+    for ref, index in node_ids.items():
+        coords[index] = node_coords[ref]
+    del node_coords
+
+    sources, targets, access, car_speeds = [], [], [], []
+    for way_refs, (forward, backward, car_speed) in ways:
+        way_nodes = [node_ids[ref] for ref in way_refs if ref in node_ids]
+        for a, b in zip(way_nodes, way_nodes[1:]):
+            if a == b:
+                continue
+            if forward:
+                sources.append(a)
+                targets.append(b)
+                access.append(forward)
+                car_speeds.append(car_speed)
+            if backward:
+                sources.append(b)
+                targets.append(a)
+                access.append(backward)
+                car_speeds.append(car_speed)
+
+    sources = np.asarray(sources, dtype=np.int32)
+    targets = np.asarray(targets, dtype=np.int32)
+    order = np.argsort(sources, kind='stable')
+    sources, targets = sources[order], targets[order]
+    access = np.asarray(access, dtype=np.uint8)[order]
+    car_speeds = np.asarray(car_speeds, dtype=np.float32)[order]
+    lengths = _haversine_m(
+        coords[sources, 0], coords[sources, 1], coords[targets, 0], coords[targets, 1]
+    ).astype(np.float32)
+
+    node_count = len(coords)
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+
+    node_access = np.zeros(node_count, dtype=np.uint8)
+    np.bitwise_or.at(node_access, sources, access)
+    np.bitwise_or.at(node_access, targets, access)
+
+    cells = _cell_keys(coords[:, 0], coords[:, 1], cell_size)
+    cell_order = np.argsort(cells, kind='stable')
+
+    arrays = {
+        'node_lat': coords[:, 0].astype(np.float32),
+        'node_lng': coords[:, 1].astype(np.float32),
+        'node_access': node_access,
+        'offsets': offsets,
+        'targets': targets,
+        'lengths': lengths,
+        'car_speeds': car_speeds,
+        'access': access,
+        'cell_keys': cells[cell_order],
+        'cell_nodes': cell_order.astype(np.int32),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f'{name}.npy'), array)
+
+    meta = {
+        'version': GRAPH_FORMAT_VERSION,
+        'source': os.path.basename(osm_path),
+        'nodes': int(node_count),
+        'edges': int(len(targets)),
+        'cell_size': cell_size,
+        'max_car_speed': float(car_speeds.max()) if len(car_speeds) else 0.0,
+        'bounds': [float(coords[:, 0].min()), float(coords[:, 1].min()),
+                   float(coords[:, 0].max()), float(coords[:, 1].max())],
+    }
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _cell_keys(lats, lngs, cell_size):
+    """Pack (row, col) grid cells into sortable int64 keys"""
+    rows = np.floor((np.asarray(lats, dtype=np.float64) + 90) / cell_size).astype(np.int64)
+    cols = np.floor((np.asarray(lngs, dtype=np.float64) + 180) / cell_size).astype(np.int64)
+    return rows * 1000000 + cols
+
+
+class LocalRouter:
+    """
+    A* shortest-duration routing over a memory-mapped graph built by build_graph
+    """
+    def __init__(self, graph_dir):
+        with open(os.path.join(graph_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != GRAPH_FORMAT_VERSION:
+            raise ValueError(f'Unsupported graph format in {graph_dir}, rebuild it with `flask build-graph`')
+        for name in GRAPH_ARRAYS:
+            setattr(self, name, np.load(os.path.join(graph_dir, f'{name}.npy'), mmap_mode='r'))
+        self.cell_size = self.meta['cell_size']
+
+    def nearest_node(self, coords, profile):
+        """
+        Closest graph node usable by a profile, searching outward ring by ring
+
+        Returns:
+            int: Node index, or None if nothing is within MAX_SNAP_METERS
+        """
+        lat, lng = coords
+        bit = PROFILE_BITS[profile]
+        row = int(math.floor((lat + 90) / self.cell_size))
+        col = int(math.floor((lng + 180) / self.cell_size))
+        max_ring = int(MAX_SNAP_METERS / (111320 * self.cell_size)) + 1
+
+        best, best_dist = None, None
+        for ring in range(max_ring + 1):
+            candidates = []
+            for r in range(row - ring, row + ring + 1):
+                # Only the ring's border cells are new; inner cells were searched already
+                step = 1 if r in (row - ring, row + ring) else 2 * ring or 1
+                for c in range(col - ring, col + ring + 1, step):
+                    key = r * 1000000 + c
+                    lo = np.searchsorted(self.cell_keys, key, side='left')
+                    hi = np.searchsorted(self.cell_keys, key, side='right')
+                    if hi > lo:
+                        candidates.append(self.cell_nodes[lo:hi])
+            if candidates:
+                nodes = np.concatenate(candidates)
+                nodes = nodes[(self.node_access[nodes] & bit) != 0]
+                if len(nodes):
+                    dists = _haversine_m(lat, lng, self.node_lat[nodes], self.node_lng[nodes])
+                    i = int(np.argmin(dists))
+                    if best_dist is None or dists[i] < best_dist:
+                        best, best_dist = int(nodes[i]), float(dists[i])
+            # Anything in a further ring is at least ring * cell_size away
+            if best is not None and best_dist <= ring * self.cell_size * 111320 * math.cos(math.radians(lat)):
+                break
+        if best is None or best_dist > MAX_SNAP_METERS:
+            return None
+        return best
+
+    def _edge_speeds(self, start, stop, profile):
+        """Speeds in m/s for the edge slice [start, stop)"""
+        if profile == 'car':
+            return self.car_speeds[start:stop] / 3.6
+        return np.full(stop - start, PROFILE_SPEEDS[profile] / 3.6, dtype=np.float32)
+
+    def shortest_path(self, source, target, profile):
+        """
+        A* on travel time with a straight-line-at-top-speed heuristic
+
+        Returns:
+            tuple: (node path, distance m, duration s), or None if unreachable
+        """
+        bit = PROFILE_BITS[profile]
+        top_speed = (self.meta['max_car_speed'] if profile == 'car' else PROFILE_SPEEDS[profile]) / 3.6
+        target_lat = float(self.node_lat[target])
+        target_lng = float(self.node_lng[target])
+        cos_lat = math.cos(math.radians(target_lat))
+
+        def heuristic(node):
+            # Equirectangular distance is accurate enough at city scale and stays admissible
+            # after the 0.99 shrink factor
+            dlat = math.radians(float(self.node_lat[node]) - target_lat)
+            dlng = math.radians(float(self.node_lng[node]) - target_lng) * cos_lat
+            return 0.99 * EARTH_RADIUS_M * math.sqrt(dlat * dlat + dlng * dlng) / top_speed
+
+        best = {source: 0.0}
+        dist = {source: 0.0}
+        parent = {source: -1}
+        closed = set()
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+
+            start, stop = int(self.offsets[node]), int(self.offsets[node + 1])
+            if start == stop:
+                continue
+            usable = (self.access[start:stop] & bit) != 0
+            if not usable.any():
+                continue
+            neighbours = self.targets[start:stop][usable]
+            lengths = self.lengths[start:stop][usable]
+            times = lengths / self._edge_speeds(start, stop, profile)[usable]
+            for neighbour, length, time in zip(neighbours.tolist(), lengths.tolist(), times.tolist()):
+                new_cost = cost + time
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    dist[neighbour] = dist[node] + length
+                    parent[neighbour] = node
+                    heapq.heappush(heap, (new_cost + heuristic(neighbour), new_cost, neighbour))
+        else:
+            return None
+
+        path = [target]
+        while parent[path[-1]] != -1:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path, dist[target], best[target]
+
+    def route(self, start, end, profile):
+        """
+        Route between two (lat, lng) points
+
+        Args:
+            start (tuple): (lat, lng) of the origin
+            end (tuple): (lat, lng) of the destination
+            profile (str): 'foot', 'bike' or 'car'
+
+        Returns:
+            dict: {'distance' (m), 'duration' (s), 'points' [(lat, lng), ...]},
+            or None when either point is off the graph or no path exists
+        """
+        if profile not in PROFILE_BITS:
+            return None
+        source = self.nearest_node(start, profile)
+        target = self.nearest_node(end, profile)
+        if source is None or target is None:
+            return None
+
+        found = self.shortest_path(source, target, profile)
+        if found is None:
+            return None
+        path, distance, duration = found
+        nodes = np.asarray(path, dtype=np.int64)
+        # Coordinates are stored as float32; round off the conversion noise
+        points = list(zip(np.round(self.node_lat[nodes].astype(np.float64), 6).tolist(),
+                          np.round(self.node_lng[nodes].astype(np.float64), 6).tolist()))
+        return {'distance': distance, 'duration': duration, 'points': points}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_local_router():
+    """Process-wide LocalRouter for Config.LOCAL_GRAPH_PATH, or None if no graph is built"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None and os.path.exists(os.path.join(Config.LOCAL_GRAPH_PATH, 'meta.json')):
+                _router = LocalRouter(Config.LOCAL_GRAPH_PATH)
+    return _router
+
+
+def local_route(start, end, profile):
+    """
+    Route with the local graph in the same shape as routes.get_osrm_route
+
+    Returns:
+        dict: {'distance' (km), 'duration' (minutes), 'geometry' (polyline6)}, or None
+    """
+    router = get_local_router()
+    result = router.route(start, end, profile) if router else None
+    if result is None:
+        return None
+    return {
+        'distance': round(result['distance'] / 1000, 2),
+        'duration': round(result['duration'] / 60),
+        'geometry': encode_polyline(result['points'], precision=6)
+    }
+
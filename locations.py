@@ -0,0 +1,59 @@
+"""
+Interned places for Eco-Go
+Every distinct address (after normalization) is stored once as a Location,
+so routes, geocodes and statistics can refer to a small integer id
+"""
+from datetime import datetime
+from sqlalchemy import update
+from cache import normalize_address
+from extensions import db
+from models import Location, insert_ignore
+
+
+def intern_locations(names):
+    """
+    Get or create the Location for each address. Does not commit.
+
+    Args:
+        names (iterable): Free-text addresses
+
+    Returns:
+        dict: {address: Location row (id, key, name, lat, lng)} for every
+        address that normalizes to a non-empty key
+    """
+    keys = {}
+    for name in names:
+        key = normalize_address(name)
+        if key:
+            keys[name] = key
+    if not keys:
+        return {}
+
+    new_rows = {}
+    for name, key in keys.items():
+        new_rows.setdefault(key, {'key': key, 'name': name.strip()[:128]})
+    insert_ignore(Location, list(new_rows.values()))
+
+    rows = db.session.query(Location.id, Location.key, Location.name, Location.lat, Location.lng)\
+        .filter(Location.key.in_(list(new_rows)))\
+        .all()
+    by_key = {row.key: row for row in rows}
+    return {name: by_key[key] for name, key in keys.items()}
+
+
+def find_location(address):
+    """The Location an address normalizes to, or None if it has never been saved"""
+    key = normalize_address(address)
+    if not key:
+        return None
+    return Location.query.filter_by(key=key).first()
+
+
+def remember_coordinates(location_id, coords):
+    """Store geocoded coordinates on a Location and commit"""
+    db.session.execute(
+        update(Location)
+        .where(Location.id == location_id)
+        .values(lat=coords[0], lng=coords[1], geocoded_at=datetime.utcnow())
+    )
+    db.session.commit()
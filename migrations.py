@@ -0,0 +1,111 @@
+"""
+Lightweight schema upgrades for Eco-Go
+db.create_all() only creates missing tables, so columns and indexes added to
+existing tables, and the data migrations they need, are applied here.
+Concurrent upgrades (several workers starting at once) race on ALTER/CREATE
+INDEX and the data migration, so callers hold schema_lock() around them.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from sqlalchemy import func, inspect, select, text, update, delete
+
+
+@contextmanager
+def schema_lock(path, timeout=300):
+    """
+    Cross-process lock for schema changes
+
+    An exclusive transaction on a SQLite file: other processes wait up to
+    `timeout` seconds for it, and the OS releases it if the holder dies.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    try:
+        conn.execute('BEGIN EXCLUSIVE')
+        yield
+    finally:
+        conn.close()
+
+
+def upgrade_schema(db):
+    """Create missing tables and bring an existing database up to date with the models"""
+    db.create_all()
+    inspector = inspect(db.engine)
+    _add_missing_columns(db, inspector)
+    migrate_route_locations(db)
+    _create_missing_indexes(db, inspect(db.engine))
+
+
+def _add_missing_columns(db, inspector):
+    """ALTER TABLE ... ADD COLUMN for nullable model columns the database lacks"""
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
+
+def _create_missing_indexes(db, inspector):
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+
+
+def migrate_route_locations(db):
+    """
+    Link routes saved before Location existed to interned locations, then merge
+    routes that turn out to join the same pair of locations ("London" and
+    "london " become one route). Safe to run repeatedly.
+    """
+    from locations import intern_locations
+    from models import Route
+
+    routes = Route.query.filter(
+        (Route.start_location_id.is_(None)) | (Route.end_location_id.is_(None))
+    ).all()
+    if routes:
+        locations = intern_locations(
+            [route.start_location for route in routes] + [route.end_location for route in routes]
+        )
+        for route in routes:
+            start = locations.get(route.start_location)
+            end = locations.get(route.end_location)
+            if start and end:
+                route.start_location_id = start.id
+                route.end_location_id = end.id
+        db.session.commit()
+
+    merge_duplicate_routes(db)
+
+
+def merge_duplicate_routes(db):
+    """Point saved routes at the oldest Route for each location pair and drop the duplicates"""
+    from models import Route, SavedRoute
+
+    keepers = select(
+        Route.start_location_id, Route.end_location_id, func.min(Route.id).label('keep_id')
+    )\
+    .where(Route.start_location_id.isnot(None), Route.end_location_id.isnot(None))\
+    .group_by(Route.start_location_id, Route.end_location_id)\
+    .having(func.count(Route.id) > 1)
+
+    for start_id, end_id, keep_id in db.session.execute(keepers).all():
+        duplicates = select(Route.id).where(
+            Route.start_location_id == start_id,
+            Route.end_location_id == end_id,
+            Route.id != keep_id
+        )
+        db.session.execute(update(SavedRoute).where(SavedRoute.route_id.in_(duplicates)).values(route_id=keep_id))
+        db.session.execute(delete(Route).where(Route.id.in_(duplicates)))
+    db.session.commit()
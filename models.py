@@ -2,6 +2,12 @@ from extensions import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.dialects import postgresql, sqlite
+
+def insert_ignore(model, values):
+    """INSERT rows, skipping any that conflict with a primary key or unique constraint (SQLite and PostgreSQL)"""
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    db.session.execute(dialect.insert(model).values(values).on_conflict_do_nothing())
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,12 +26,32 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class Location(db.Model):
+    """A distinct place, keyed by its normalized address"""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(128), unique=True, nullable=False)
+    name = db.Column(db.String(128), nullable=False)
+    lat = db.Column(db.Float)
+    lng = db.Column(db.Float)
+    geocoded_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Location {self.name}>'
+
 class Route(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     start_location = db.Column(db.String(128), nullable=False)
     end_location = db.Column(db.String(128), nullable=False)
+    start_location_id = db.Column(db.Integer, db.ForeignKey('location.id'))
+    end_location_id = db.Column(db.Integer, db.ForeignKey('location.id'))
     distance = db.Column(db.Float, nullable=False) 
     saved_routes = db.relationship('SavedRoute', backref='route', lazy='dynamic')
+    start_place = db.relationship('Location', foreign_keys=[start_location_id])
+    end_place = db.relationship('Location', foreign_keys=[end_location_id])
+
+    __table_args__ = (
+        db.Index('uq_route_location_pair', 'start_location_id', 'end_location_id', unique=True),
+    )
     
     def __repr__(self):
         return f'<Route from {self.start_location} to {self.end_location}>'
@@ -37,6 +63,42 @@ class SavedRoute(db.Model):
     transport_mode = db.Column(db.String(64), nullable=False)
     carbon_saved = db.Column(db.Float, nullable=False)
     date_saved = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_saved_route_user_date', 'user_id', 'date_saved'),
+        db.Index('ix_saved_route_user_mode', 'user_id', 'transport_mode'),
+        db.Index('ix_saved_route_date_route', 'date_saved', 'route_id'),
+    )
     
     def __repr__(self):
-        return f'<SavedRoute {self.id} by {self.user_id}>'
\ No newline at end of file
+        return f'<SavedRoute {self.id} by {self.user_id}>'
+
+class UserStats(db.Model):
+    """Running carbon totals per user, maintained alongside SavedRoute"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_carbon_saved = db.Column(db.Float, nullable=False, default=0)
+    route_count = db.Column(db.Integer, nullable=False, default=0)
+    last_trip_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+class UserModeStats(db.Model):
+    """Saved route count per user and transport mode"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    transport_mode = db.Column(db.String(64), primary_key=True)
+    route_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserModeStats {self.user_id} {self.transport_mode}>'
+
+class DailySavings(db.Model):
+    """Carbon saved per user, day and transport mode, maintained alongside SavedRoute"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    transport_mode = db.Column(db.String(64), primary_key=True)
+    carbon_saved = db.Column(db.Float, nullable=False, default=0)
+    route_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySavings {self.user_id} {self.day} {self.transport_mode}>'
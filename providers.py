@@ -0,0 +1,386 @@
+"""
+Geocoding and routing providers for Eco-Go
+Every upstream (Nominatim, OSRM, the offline engines, the straight-line
+estimator) implements the same Provider interface. Calls go through a
+per-provider circuit breaker, so a dead upstream fails fast, and network
+providers can hedge a second request once the first is slower than their
+usual latency. Providers are tried in the order configured in
+Config.ROUTING_PROVIDERS / Config.GEOCODER_PROVIDERS.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from cache import cached_route
+from config import Config
+from estimator import estimator
+from geometry import encode_polyline
+from http_client import http_client
+from local_geocoder import get_local_geocoder
+from local_router import get_local_router, local_route
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """An upstream call failed (as opposed to finding nothing)"""
+
+
+class CircuitOpenError(ProviderError):
+    """The provider's circuit breaker is open, so the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Closed: calls go through. After `failure_threshold` failures in a row it
+    opens and rejects calls for `reset_timeout` seconds, then lets a single
+    trial call through (half-open); success closes it, failure re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a call may go through now"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LatencyWindow:
+    """Latencies (seconds) of the most recent successful calls"""
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+
+# Hedged duplicates run here so they never queue behind the requests they are hedging
+_hedge_pool = ThreadPoolExecutor(max_workers=Config.ROUTING_POOL_SIZE)
+
+
+class Provider:
+    """
+    Base class for geocoding/routing upstreams
+
+    Subclasses implement any of geocode, route and table. Each returns None
+    when the upstream answered but found nothing, and raises on failure so the
+    circuit breaker can count it.
+    """
+    name = None
+    # Send a duplicate request when the first is slower than this provider's HEDGE_PERCENTILE
+    hedge = False
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(Config.BREAKER_FAILURES, Config.BREAKER_RESET)
+        self.latency = LatencyWindow()
+        self.calls = 0
+        self.failures = 0
+        self.hedged = 0
+        self.unavailable_reason = None
+
+    def available(self):
+        """False when the provider is not set up (e.g. no local graph built)"""
+        return True
+
+    def usable(self):
+        """
+        available(), treating an exception (e.g. an on-disk index in an old
+        format) as unavailable; the error is logged once per distinct message
+        """
+        try:
+            return self.available()
+        except Exception as e:
+            reason = f'{type(e).__name__}: {e}'
+            if reason != self.unavailable_reason:
+                self.unavailable_reason = reason
+                logger.warning('%s provider unavailable: %s', self.name, reason)
+            return False
+
+    def supports(self, operation):
+        return getattr(type(self), operation) is not getattr(Provider, operation)
+
+    def geocode(self, address):
+        """(lat, lng) for an address, or None"""
+        raise NotImplementedError
+
+    def route(self, start, end, profile):
+        """{'distance' (km), 'duration' (minutes), 'geometry' (polyline6)}, or None"""
+        raise NotImplementedError
+
+    def table(self, sources, destinations, profile):
+        """{'distances': [[km]], 'durations': [[minutes]]} with None cells, or None"""
+        raise NotImplementedError
+
+    def call(self, operation, *args):
+        """
+        Run an operation through the circuit breaker, hedging if enabled
+
+        Raises:
+            CircuitOpenError: The breaker is open
+            ProviderError: The call failed
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'{self.name} circuit open')
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            result = self._hedged(getattr(self, operation), *args)
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f'{self.name}: {e}') from e
+        # Latency as the caller saw it, so a hedged straggler does not inflate the percentile
+        self.latency.add(time.perf_counter() - started)
+        self.breaker.record_success()
+        return result
+
+    def _hedge_delay(self):
+        if not self.hedge or not Config.HEDGE_PERCENTILE or len(self.latency) < Config.HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(Config.HEDGE_PERCENTILE)
+
+    def _hedged(self, fn, *args):
+        delay = self._hedge_delay()
+        if delay is None:
+            return fn(*args)
+
+        first = _hedge_pool.submit(fn, *args)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        pending = {first, _hedge_pool.submit(fn, *args)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def status(self):
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            'available': self.usable(),
+            'unavailable_reason': self.unavailable_reason,
+            'state': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'rejected': self.breaker.rejected,
+            'hedged': self.hedged,
+            'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+            'p95_ms': None if p95 is None else round(p95 * 1000, 1),
+        }
+
+
+class NominatimProvider(Provider):
+    """OpenStreetMap Nominatim search; never hedged, its usage policy allows 1 request/second"""
+    name = 'nominatim'
+
+    def geocode(self, address):
+        res = http_client.get(
+            f'{Config.NOMINATIM_URL}/search',
+            params={'q': address, 'format': 'json', 'limit': 1},
+            timeout=Config.PROVIDER_TIMEOUT
+        )
+        res.raise_for_status()
+        data = res.json()
+        if data:
+            return (float(data[0]['lat']), float(data[0]['lon']))
+        return None
+
+
+class OSRMProvider(Provider):
+    """Public OSRM server (route and table services)"""
+    name = 'osrm'
+    hedge = True
+    base_url = Config.OSRM_URL
+
+    def route(self, start, end, profile):
+        url = f"{self.base_url}/route/v1/{profile}/{start[1]},{start[0]};{end[1]},{end[0]}"
+        res = http_client.get(url, params={'overview': 'full', 'geometries': 'polyline6'},
+                           timeout=Config.PROVIDER_TIMEOUT)
+        data = res.json()
+        if data.get('code') == 'Ok':
+            route = data['routes'][0]
+            return {
+                'distance': round(route['distance'] / 1000, 2),  # km
+                'duration': round(route['duration'] / 60),    # minutes
+                'geometry': route['geometry']                 # polyline6
+            }
+        if data.get('code') in ('NoRoute', 'NoSegment'):
+            return None
+        raise ProviderError(f"OSRM route failed: {data.get('code')}")
+
+    def table(self, sources, destinations, profile):
+        coords = ';'.join(f"{lng},{lat}" for lat, lng in list(sources) + list(destinations))
+        res = http_client.get(f"{self.base_url}/table/v1/{profile}/{coords}", params={
+            'sources': ';'.join(str(i) for i in range(len(sources))),
+            'destinations': ';'.join(str(len(sources) + i) for i in range(len(destinations))),
+            'annotations': 'distance,duration'
+        }, timeout=Config.OSRM_TABLE_TIMEOUT)
+        data = res.json()
+        if data.get('code') != 'Ok':
+            raise ProviderError(f"OSRM table failed: {data.get('code')}")
+        return {
+            'distances': [[None if d is None else round(d / 1000, 2) for d in row] for row in data['distances']],
+            'durations': [[None if d is None else round(d / 60) for d in row] for row in data['durations']]
+        }
+
+
+class LocalGraphProvider(Provider):
+    """Offline A* router over the graph built by `flask build-graph`"""
+    name = 'local'
+
+    def available(self):
+        return get_local_router() is not None
+
+    def route(self, start, end, profile):
+        return local_route(start, end, profile)
+
+
+class GazetteerProvider(Provider):
+    """Offline geocoder over the index built by `flask build-gazetteer`"""
+    name = 'local'
+
+    def available(self):
+        return get_local_geocoder() is not None
+
+    def geocode(self, address):
+        return get_local_geocoder().geocode(address)
+
+
+class EstimateProvider(Provider):
+    """
+    Straight-line distance scaled by the estimator's calibrated detour factor
+    and speed; always answers, so it belongs last in the fallback order.
+    Results carry 'estimate': True.
+    """
+    name = 'estimate'
+
+    def route(self, start, end, profile):
+        route = estimator.estimate(start, end, profile)
+        route['geometry'] = encode_polyline([start, end], precision=6)
+        return route
+
+    def table(self, sources, destinations, profile):
+        return estimator.table(sources, destinations, profile)
+
+    def status(self):
+        status = super().status()
+        status['calibration'] = estimator.status()
+        return status
+
+
+ROUTING_PROVIDERS = {
+    'local': LocalGraphProvider(),
+    'osrm': OSRMProvider(),
+    'estimate': EstimateProvider(),
+}
+
+GEOCODING_PROVIDERS = {
+    'local': GazetteerProvider(),
+    'nominatim': NominatimProvider(),
+}
+
+
+def _first_result(registry, order, operation, *args):
+    """Try each configured provider in order; the first non-empty answer wins"""
+    for name in order:
+        provider = registry.get(name)
+        if provider is None or not provider.supports(operation) or not provider.usable():
+            continue
+        try:
+            result = provider.call(operation, *args)
+        except ProviderError:
+            continue
+        if result is not None:
+            return result
+    return None
+
+
+def geocode_address(address):
+    """(lat, lng) from the first geocoding provider that finds the address, or None"""
+    return _first_result(GEOCODING_PROVIDERS, Config.GEOCODER_PROVIDERS, 'geocode', address)
+
+
+def route_profile(start, end, profile):
+    """Route for one profile from the first routing provider that answers, or None"""
+    return _first_result(ROUTING_PROVIDERS, Config.ROUTING_PROVIDERS, 'route', start, end, profile)
+
+
+def route_table(sources, destinations, profile):
+    """Distance/duration matrices from the first routing provider with a table service, or None"""
+    return _first_result(ROUTING_PROVIDERS, Config.ROUTING_PROVIDERS, 'table', sources, destinations, profile)
+
+
+def cached_route_profile(start, end, profile):
+    """route_profile served from the shared route cache; estimates are never cached"""
+    return cached_route(profile, start, end, route_profile, variant='polyline6')
+
+
+def provider_status():
+    """Breaker state, call counts and latency for every provider, plus outbound HTTP queue metrics"""
+    return {
+        'http': http_client.stats(),
+        'routing': {name: p.status() for name, p in ROUTING_PROVIDERS.items()},
+        'geocoding': {name: p.status() for name, p in GEOCODING_PROVIDERS.items()},
+        'routing_order': Config.ROUTING_PROVIDERS,
+        'geocoding_order': Config.GEOCODER_PROVIDERS,
+    }
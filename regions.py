@@ -0,0 +1,213 @@
+"""
+Region resolver for Eco-Go
+Maps coordinates to the emission region (see Config.REGIONAL_EMISSION_FACTORS)
+whose boundary contains them, using the polygons in a GeoJSON file. A uniform
+grid is precomputed over every region: cells wholly inside a region answer
+directly, and cells crossed by a boundary keep only the few edges that cross
+them plus the inside/outside state of a reference point, so a lookup is a dict
+access and at most a handful of segment tests.
+"""
+import json
+import math
+import os
+import threading
+import numpy as np
+from config import Config
+
+
+def _rings(geometry):
+    """Every ring of a GeoJSON Polygon or MultiPolygon as a list of (lng, lat)"""
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return []
+    return [[(float(p[0]), float(p[1])) for p in ring] for polygon in polygons for ring in polygon]
+
+
+def _inside_on_line(edges, y, xs):
+    """
+    Even-odd point-in-polygon for points sharing latitude y, against an
+    (E, 4) array of x1, y1, x2, y2 edges: a point is inside when an odd
+    number of edges cross the line to its east
+    """
+    x1, y1, x2, y2 = edges.T
+    crossing = (y1 > y) != (y2 > y)
+    crossings = np.sort(x1[crossing] + (y - y1[crossing]) * (x2[crossing] - x1[crossing])
+                        / (y2[crossing] - y1[crossing]))
+    return (len(crossings) - np.searchsorted(crossings, xs, side='right')) % 2 == 1
+
+
+class RegionIndex:
+    """
+    Grid index over region polygons
+
+    Each cell maps to a region name (wholly inside) or to a tuple of
+    (region, ref_lng, ref_lat, ref_inside, edges) for regions whose boundary
+    crosses the cell. A point is inside such a region when the segment from
+    it to the reference point crosses the cell's edges an even number of
+    times and the reference point is inside, or an odd number and it is not.
+    """
+    def __init__(self, features, cell_size=1.0):
+        """
+        Args:
+            features (list): GeoJSON features with a 'region' property
+            cell_size (float): Grid cell size in degrees
+        """
+        self.cell_size = cell_size
+        self.regions = []
+        cells = {}
+
+        for feature in features:
+            region = (feature.get('properties') or {}).get('region')
+            rings = _rings(feature.get('geometry') or {})
+            if not region or not rings:
+                continue
+            region = region.lower()
+            self.regions.append(region)
+
+            edges = np.array(
+                [(*ring[i], *ring[i + 1]) for ring in rings for i in range(len(ring) - 1) if ring[i] != ring[i + 1]],
+                dtype=np.float64
+            )
+            # Edges crossing each cell, by row then column
+            boundary = {}
+            for edge in edges:
+                for row, col in self._cells_in(min(edge[1], edge[3]), min(edge[0], edge[2]),
+                                               max(edge[1], edge[3]), max(edge[0], edge[2])):
+                    boundary.setdefault(row, {}).setdefault(col, []).append(tuple(edge))
+
+            # Reference points of a row share a latitude, so one scanline answers the whole row.
+            # Rings are closed, so the edge start points cover every vertex
+            min_col = math.floor(edges[:, 0].min() / cell_size)
+            cols = np.arange(min_col, math.floor(edges[:, 0].max() / cell_size) + 1)
+            for row in range(math.floor(edges[:, 1].min() / cell_size), math.floor(edges[:, 1].max() / cell_size) + 1):
+                ref_lngs, ref_lat = self._reference_point(row, cols)
+                inside = _inside_on_line(edges, ref_lat, ref_lngs)
+                crossed = boundary.get(row, {})
+                for col in cols[inside].tolist():
+                    if col not in crossed:
+                        cells.setdefault((row, col), []).append(region)
+                for col, cell_edges in crossed.items():
+                    i = col - min_col
+                    cells.setdefault((row, col), []).append(
+                        (region, float(ref_lngs[i]), ref_lat, bool(inside[i]), tuple(cell_edges))
+                    )
+
+        # A cell wholly inside one region stores just the name
+        self._cells = {
+            cell: entries[0] if len(entries) == 1 and isinstance(entries[0], str) else tuple(entries)
+            for cell, entries in cells.items()
+        }
+
+    @classmethod
+    def from_geojson(cls, path, cell_size=1.0):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('features', []), cell_size=cell_size)
+
+    def _cells_in(self, min_lat, min_lng, max_lat, max_lng):
+        size = self.cell_size
+        for row in range(math.floor(min_lat / size), math.floor(max_lat / size) + 1):
+            for col in range(math.floor(min_lng / size), math.floor(max_lng / size) + 1):
+                yield row, col
+
+    def _reference_point(self, row, col):
+        # Off-centre by irregular fractions, so it does not land on edges through round coordinates.
+        # col may be an array of columns
+        size = self.cell_size
+        return (col + 0.5123457) * size, (row + 0.4719283) * size
+
+    def lookup(self, lat, lng):
+        """
+        Region containing a point
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            str: Region name, or None if the point is in no region
+        """
+        cell = self._cells.get((math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)))
+        if cell is None or isinstance(cell, str):
+            return cell
+        for entry in cell:
+            if isinstance(entry, str):
+                return entry
+            region, cx, cy, inside, edges = entry
+            for ax, ay, bx, by in edges:
+                d1 = (bx - ax) * (lat - ay) - (by - ay) * (lng - ax)
+                d2 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+                if (d1 > 0) == (d2 > 0):
+                    continue
+                d3 = (cx - lng) * (ay - lat) - (cy - lat) * (ax - lng)
+                d4 = (cx - lng) * (by - lat) - (cy - lat) * (bx - lng)
+                if (d3 > 0) != (d4 > 0):
+                    inside = not inside
+            if inside:
+                return region
+        return None
+
+    def lookup_many(self, points):
+        """Region (or None) for each (lat, lng) in points; None entries stay None"""
+        return [self.lookup(point[0], point[1]) if point else None for point in points]
+
+    def __len__(self):
+        return len(self._cells)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# (place, lat, lng, expected region) on either side of region borders, checked by `flask check-regions`
+BORDER_CHECKS = [
+    ('Detroit', 42.331, -83.046, 'usa'), ('Windsor', 42.301, -83.018, None),
+    ('San Ysidro', 32.553, -117.043, 'usa'), ('Tijuana', 32.515, -117.038, None),
+    ('El Paso', 31.759, -106.487, 'usa'), ('Ciudad Juarez', 31.690, -106.424, None),
+    ('Laredo', 27.506, -99.507, 'usa'), ('Nuevo Laredo', 27.476, -99.516, None),
+    ('Niagara Falls NY', 43.094, -79.056, 'usa'), ('Niagara Falls ON', 43.090, -79.085, None),
+    ('Point Roberts', 48.985, -123.068, 'usa'), ('Surrey', 49.005, -122.757, None),
+    ('Key West', 24.555, -81.780, 'usa'), ('Honolulu', 21.307, -157.858, 'usa'),
+    ('Gibraltar', 36.140, -5.353, 'europe'), ('Tangier', 35.759, -5.834, None),
+    ('Narva', 59.377, 28.190, 'europe'), ('Kaliningrad', 54.710, 20.511, 'europe'),
+    ('Reykjavik', 64.147, -21.942, 'europe'), ('Valletta', 35.899, 14.514, 'europe'),
+    ('Batumi', 41.642, 41.634, 'asia'), ('Yekaterinburg', 56.838, 60.597, 'asia'),
+    ('Tel Aviv', 32.085, 34.782, 'asia'), ('Cairo', 30.044, 31.236, None),
+    ('Singapore', 1.290, 103.852, 'asia'), ('Vladivostok', 43.116, 131.886, 'asia'),
+]
+
+
+def check_region_index(index, checks=BORDER_CHECKS):
+    """
+    Look up each check point
+
+    Returns:
+        list: (place, expected, actual) for every point resolved to the wrong region
+    """
+    mismatches = []
+    for place, lat, lng, expected in checks:
+        actual = index.lookup(lat, lng)
+        if actual != expected:
+            mismatches.append((place, expected, actual))
+    return mismatches
+
+
+def get_region_index():
+    """Process-wide RegionIndex for Config.REGION_BOUNDARIES_PATH, or None if the file is missing"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None and os.path.exists(Config.REGION_BOUNDARIES_PATH):
+                _index = RegionIndex.from_geojson(Config.REGION_BOUNDARIES_PATH, Config.REGION_GRID_DEGREES)
+    return _index
+
+
+def region_for(coords):
+    """Emission region for a (lat, lng) pair, or None if unknown"""
+    index = get_region_index()
+    if index is None or not coords:
+        return None
+    return index.lookup(coords[0], coords[1])
@@ -1,93 +1,429 @@
-from flask import render_template, request, jsonify, redirect, url_for, flash
+from flask import render_template, request, jsonify, redirect, url_for, flash, has_app_context, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, Route, SavedRoute
-from carbon_calculator import calculate_carbon_emissions
-import requests
+from models import User
+from stats import get_user_stats, evaluate_achievements, get_savings_series
+from history import get_saved_routes_page, parse_trip, save_trips
+from locations import find_location, remember_coordinates
+from carbon_calculator import calculate_carbon_emissions, calculate_batch_emissions
+from cache import cached_geocode, cache_stats, normalize_address
+from autocomplete import autocomplete_index, MAX_SUGGESTIONS
+from jobs import job_queue, QueueFullError, DONE, FAILED
+from config import Config
+from providers import geocode_address, cached_route_profile, route_table, provider_status
+from estimator import estimator
+from regions import region_for
+from weather import route_weather, weather_provider_status
+from geometry import MAX_ZOOM, decode_polyline, encode_polyline, simplify, tolerance_for_zoom, zoom_for_bounds
+from timing import phase, propagate
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 import json
+import time
+from datetime import date
 
 def geocode(address):
-    """Convert address to (lat, lng) using free Nominatim API"""
-    try:
-        res = requests.get(
-            'https://nominatim.openstreetmap.org/search',
-            params={'q': address, 'format': 'json', 'limit': 1},
-            headers={'User-Agent': 'eco-route-app'},
-            timeout=5
-        )
-        data = res.json()
-        if data:
-            return (float(data[0]['lat']), float(data[0]['lon']))
-    except Exception:
-        pass
+    """Convert address to (lat, lng), served from the geocode cache when possible"""
+    with phase('geocode'):
+        return cached_geocode(address, _lookup_coordinates)
+
+def _stored_coordinates(address):
+    """Coordinates stored on the address's Location, or None; never asks a geocoder"""
+    location = find_location(address) if has_app_context() else None
+    if location is not None and location.lat is not None:
+        return (location.lat, location.lng)
     return None
 
+def _lookup_coordinates(address):
+    """Coordinates stored on the address's Location, else the geocoder backend (remembered on the Location)"""
+    location = find_location(address) if has_app_context() else None
+    if location is not None and location.lat is not None:
+        return (location.lat, location.lng)
+
+    coords = geocode_address(address)
+    if coords and location is not None:
+        remember_coordinates(location.id, coords)
+    return coords
+
+# OSRM profile used for each transport mode; bus, train and rideshare follow the road network
+OSRM_PROFILES = {
+    'walking': 'foot', 'biking': 'bike',
+    'car': 'car', 'bus': 'car', 'train': 'car', 'rideshare': 'car'
+}
+
+# (transport mode, Config.EMISSIONS key) for every option shown to the user
+ROUTE_MODES = [
+    ('walking', 'walking'), ('biking', 'biking'),
+    ('bus', 'bus'), ('train', 'train'),
+    ('car', 'car_medium'), ('rideshare', 'rideshare')
+]
+
+_routing_pool = ThreadPoolExecutor(max_workers=Config.ROUTING_POOL_SIZE)
+
 def get_osrm_route(start, end, mode):
     """Get real distance/duration from OSRM free routing API"""
-    osrm_mode = {
-        'walking': 'foot', 'biking': 'bike',
-        'car': 'car', 'bus': 'car', 'train': 'car', 'rideshare': 'car'
-    }.get(mode, 'car')
+    return _osrm_profile_route(start, end, OSRM_PROFILES.get(mode, 'car'))
+
+def _osrm_profile_route(start, end, profile):
+    """Route for a single OSRM profile from the configured providers, served from the route cache when possible"""
+    with phase(f'route_{profile}'):
+        return cached_route_profile(start, end, profile)
+
+def get_profile_routes(start, end, profiles, deadline=None):
+    """
+    Fetch each distinct OSRM profile once, concurrently, under one overall deadline.
+    Profiles that fail or miss the deadline are left out of the result.
+    """
+    if deadline is None:
+        deadline = Config.ROUTING_DEADLINE
+    futures = {
+        profile: _routing_pool.submit(propagate(_osrm_profile_route), start, end, profile)
+        for profile in set(profiles)
+    }
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    routes = {}
+    for profile, future in futures.items():
+        if future in done and future.result():
+            routes[profile] = future.result()
+    return routes
+
+def _route_option(carbon_key, data, region=None):
+    """Distance/duration/emissions for one transport mode from its profile's route"""
+    option = {
+        'distance': data['distance'],
+        'duration': data['duration'],
+        'emissions': calculate_carbon_emissions(carbon_key, data['distance'], region)
+    }
+    if data.get('estimate'):
+        option['estimate'] = True
+    return option
+
+def iter_route_options(start_coords, end_coords, deadline=None):
+    """
+    Yield (mode, option) for every transport mode as soon as its profile's route arrives.
+    Profiles that fail or miss the deadline yield nothing. Emissions use the
+    regional factors of the start point's region.
+    """
+    if deadline is None:
+        deadline = Config.ROUTING_DEADLINE
+    region = region_for(start_coords)
+    futures = {
+        _routing_pool.submit(propagate(_osrm_profile_route), start_coords, end_coords, profile): profile
+        for profile in {OSRM_PROFILES[mode] for mode, _ in ROUTE_MODES}
+    }
     try:
-        url = f"https://router.project-osrm.org/route/v1/{osrm_mode}/{start[1]},{start[0]};{end[1]},{end[0]}"
-        res = requests.get(url, params={'overview': 'false'}, timeout=5)
-        data = res.json()
-        if data.get('code') == 'Ok':
-            route = data['routes'][0]
-            return {
-                'distance': round(route['distance'] / 1000, 2),  # km
-                'duration': round(route['duration'] / 60)     # minutes
-            }
-    except Exception:
-        pass
-    return None
+        for future in as_completed(futures, timeout=deadline):
+            data = future.result()
+            if not data:
+                continue
+            for mode, carbon_key in ROUTE_MODES:
+                if OSRM_PROFILES[mode] == futures[future]:
+                    yield mode, _route_option(carbon_key, data, region)
+    except TimeoutError:
+        return
+
+def estimate_route_options(start_coords, end_coords, modes=None):
+    """
+    Straight-line estimates for transport modes, from the calibrated estimator.
+    Every option is marked 'estimate': True.
+    """
+    modes = set(modes) if modes is not None else {mode for mode, _ in ROUTE_MODES}
+    region = region_for(start_coords)
+    profiles = {}
+    options = {}
+    for mode, carbon_key in ROUTE_MODES:
+        if mode not in modes:
+            continue
+        profile = OSRM_PROFILES[mode]
+        if profile not in profiles:
+            profiles[profile] = estimator.estimate(start_coords, end_coords, profile)
+        options[mode] = _route_option(carbon_key, profiles[profile], region)
+    return options
+
+def get_route_options(start, end, start_coords=None, end_coords=None, budget=None):
+    """
+    Distance, duration and emissions for every transport mode
+
+    Args:
+        start (str): Start address
+        end (str): End address
+        start_coords (tuple): Known (lat, lng) of the start, skips geocoding
+        end_coords (tuple): Known (lat, lng) of the end, skips geocoding
+        budget (float): Seconds to wait for real routes; modes still missing are
+            estimated. Defaults to Config.ROUTE_OPTIONS_BUDGET
+
+    Returns:
+        dict: {mode: option} in ROUTE_MODES order, or None if either address cannot be geocoded
+    """
+    start_coords = start_coords or geocode(start)
+    end_coords = end_coords or geocode(end)
+    if not start_coords or not end_coords:
+        return None
+
+    if budget is None:
+        budget = Config.ROUTE_OPTIONS_BUDGET
+    # Routes still running after the budget finish in the background and land in the route cache
+    options = dict(iter_route_options(start_coords, end_coords, deadline=budget))
+    missing = [mode for mode, _ in ROUTE_MODES if mode not in options]
+    if missing:
+        options.update(estimate_route_options(start_coords, end_coords, missing))
+    return {mode: options[mode] for mode, _ in ROUTE_MODES}
+
+def _sse(event, data):
+    """One Server-Sent Events message"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+def stream_route_options(start, end):
+    """
+    Server-Sent Events for a comparison: 'locations' once both addresses are
+    geocoded, one 'mode' per transport mode as it is computed, then 'done'.
+    Modes not routed within ROUTE_OPTIONS_BUDGET are sent as estimates, then
+    'weather' if conditions along the route are known.
+    An address that cannot be found ends the stream with 'error'.
+    """
+    coords = []
+    for address in (start, end):
+        found = geocode(address)
+        if not found:
+            yield _sse('error', {'error': f'Could not find "{address}". Try a more specific address.'})
+            return
+        coords.append(found)
+    yield _sse('locations', {'start': list(coords[0]), 'end': list(coords[1]), 'region': region_for(coords[0])})
+    budget_ends = time.monotonic() + Config.ROUTE_OPTIONS_BUDGET
+    weather = _routing_pool.submit(propagate(_timed_route_weather), coords[0], coords[1])
+
+    sent = set()
+    for mode, option in iter_route_options(coords[0], coords[1], deadline=Config.ROUTE_OPTIONS_BUDGET):
+        yield _sse('mode', dict(option, mode=mode))
+        sent.add(mode)
+    missing = [mode for mode, _ in ROUTE_MODES if mode not in sent]
+    for mode, option in estimate_route_options(coords[0], coords[1], missing).items():
+        yield _sse('mode', dict(option, mode=mode))
+    conditions = _weather_result(weather, budget_ends)
+    if conditions:
+        yield _sse('weather', conditions)
+    yield _sse('done', {'modes': len(ROUTE_MODES), 'estimated': len(missing)})
+
+def get_osrm_table(sources, destinations, profile):
+    """
+    Distance/duration matrices from the first configured provider with a table service
+
+    Returns:
+        dict: {'distances': [[km]], 'durations': [[minutes]]}, cells are None where
+        no route exists; None if every provider failed
+    """
+    with phase(f'table_{profile}'):
+        return route_table(sources, destinations, profile)
+
+def _chunk_pairs(pairs, max_coords):
+    """Split (start_coords, end_coords) pairs so no chunk needs more than max_coords table coordinates"""
+    chunks = []
+    current, sources, destinations = [], set(), set()
+    for index, (start, end) in pairs:
+        new_coords = (start not in sources) + (end not in destinations)
+        if current and len(sources) + len(destinations) + new_coords > max_coords:
+            chunks.append((current, sorted(sources), sorted(destinations)))
+            current, sources, destinations = [], set(), set()
+        current.append((index, start, end))
+        sources.add(start)
+        destinations.add(end)
+    if current:
+        chunks.append((current, sorted(sources), sorted(destinations)))
+    return chunks
+
+def get_batch_route_options(pairs):
+    """
+    Route options for many start/end address pairs at once
+
+    Every distinct address is geocoded once, then each chunk of pairs costs one
+    OSRM table request per distinct profile. Addresses already in the geocode
+    cache or on a Location are free; at most BATCH_MAX_GEOCODES others are sent
+    to the geocoder, within BATCH_GEOCODE_DEADLINE seconds, and pairs using an
+    address left over are reported in 'errors' with 'retry': True.
+
+    Args:
+        pairs (list): [(start, end), ...] address strings
+
+    Returns:
+        dict: 'results' with per-pair options, 'errors' with per-pair failures
+    """
+    coords = {}
+    pending = []
+    for address in sorted({address for pair in pairs for address in pair}):
+        coords[address] = cached_geocode(address, _stored_coordinates)
+        if not coords[address]:
+            pending.append(address)
+
+    # Sequential on purpose: Nominatim allows one request per second, shared by the whole app
+    deadline = time.monotonic() + Config.BATCH_GEOCODE_DEADLINE
+    unresolved = set()
+    for n, address in enumerate(pending):
+        if n >= Config.BATCH_MAX_GEOCODES or time.monotonic() >= deadline:
+            unresolved.update(pending[n:])
+            break
+        coords[address] = geocode(address)
 
-def get_route_options(start, end):
-    """Get real route options using geocoding + OSRM"""
-    start_coords = geocode(start)
-    end_coords = geocode(end)
+    results = {}
+    errors = []
+    located = []
+    for index, (start, end) in enumerate(pairs):
+        skipped = [address for address in (start, end) if address in unresolved]
+        missing = [address for address in (start, end) if not coords[address]]
+        if skipped:
+            errors.append({'index': index, 'start': start, 'end': end, 'retry': True,
+                           'error': f'"{skipped[0]}" was not looked up: geocoding budget exhausted, retry later'})
+        elif missing:
+            errors.append({'index': index, 'start': start, 'end': end,
+                           'error': f'Could not find "{missing[0]}"'})
+        else:
+            located.append((index, (coords[start], coords[end])))
+
+    profiles = sorted({OSRM_PROFILES[mode] for mode, _ in ROUTE_MODES})
+    chunks = _chunk_pairs(located, Config.OSRM_TABLE_MAX_COORDS)
+    futures = {}
+    for chunk_index, (_, sources, destinations) in enumerate(chunks):
+        for profile in profiles:
+            futures[(chunk_index, profile)] = _routing_pool.submit(propagate(get_osrm_table), sources, destinations, profile)
+    done, _ = wait(futures.values(), timeout=Config.BATCH_DEADLINE)
+
+    # Options are filled in first; emissions for every option are computed in one pass below
+    option_rows = []
+    for chunk_index, (chunk_pairs, sources, destinations) in enumerate(chunks):
+        source_index = {c: i for i, c in enumerate(sources)}
+        destination_index = {c: i for i, c in enumerate(destinations)}
+        tables = {}
+        for profile in profiles:
+            future = futures[(chunk_index, profile)]
+            tables[profile] = future.result() if future in done else None
+
+        for index, start_coords, end_coords in chunk_pairs:
+            i, j = source_index[start_coords], destination_index[end_coords]
+            region = region_for(start_coords)
+            options = {}
+            failed_modes = []
+            for mode, carbon_key in ROUTE_MODES:
+                table = tables[OSRM_PROFILES[mode]]
+                distance = table['distances'][i][j] if table else None
+                if distance is None:
+                    failed_modes.append(mode)
+                    continue
+                options[mode] = {
+                    'distance': distance,
+                    'duration': table['durations'][i][j]
+                }
+                if table.get('estimate'):
+                    options[mode]['estimate'] = True
+                option_rows.append((options[mode], carbon_key, distance, region))
+            start, end = pairs[index]
+            if options:
+                results[index] = {'index': index, 'start': start, 'end': end, 'options': options}
+            if failed_modes:
+                errors.append({'index': index, 'start': start, 'end': end,
+                               'error': 'No route found', 'modes': failed_modes})
+
+    if option_rows:
+        option_dicts, carbon_keys, distances, regions = zip(*option_rows)
+        emissions = calculate_batch_emissions(carbon_keys, distances, regions)['emissions']
+        for option, value in zip(option_dicts, emissions.tolist()):
+            option['emissions'] = value
 
-    if not start_coords or not end_coords:
-        # Fallback to placeholder if geocoding fails
-        return _fallback_route_options()
-
-    modes = {
-        'walking': 'walking',
-        'biking': 'biking',
-        'bus': 'bus',
-        'train': 'train',
-        'car': 'car',
-        'rideshare': 'rideshare'
+    return {
+        'results': [results[index] for index in sorted(results)],
+        'errors': sorted(errors, key=lambda e: e['index']),
+        'summary': {
+            'requested': len(pairs),
+            'succeeded': len(results),
+            'failed': len(pairs) - len(results)
+        }
     }
 
-    results = {}
-    for mode, carbon_key in [
-        ('walking', 'walking'), ('biking', 'biking'),
-        ('bus', 'bus'), ('train', 'train'),
-        ('car', 'car_medium'), ('rideshare', 'rideshare')
-    ]:
-        data = get_osrm_route(start_coords, end_coords, mode)
-        if data:
-            results[mode] = {
-                'distance': data['distance'],
-                'duration': data['duration'],
-                'emissions': calculate_carbon_emissions(carbon_key, data['distance'])
-            }
-
-    return results if results else _fallback_route_options()
-
-def _fallback_route_options():
-    """Used when geocoding/OSRM fails"""
-    distance = 10.0
+def get_route_geometries(start_coords, end_coords, zoom=None, precision=5):
+    """
+    Simplified, encoded geometry for every transport mode
+
+    Uses the same cached profile routes as get_route_options, simplified to
+    about one pixel at the given zoom. Modes without a route get a straight line.
+    """
+    if zoom is None:
+        zoom = zoom_for_bounds(start_coords, end_coords)
+    tolerance = tolerance_for_zoom(zoom, (start_coords[0] + end_coords[0]) / 2)
+
+    profile_routes = get_profile_routes(
+        start_coords, end_coords,
+        [OSRM_PROFILES[mode] for mode, _ in ROUTE_MODES]
+    )
+
+    encoded = {}
+    for profile, data in profile_routes.items():
+        if data.get('geometry'):
+            points = simplify(decode_polyline(data['geometry'], precision=6), tolerance)
+            encoded[profile] = encode_polyline(points, precision)
+    straight_line = encode_polyline([start_coords, end_coords], precision)
+
+    return {
+        'start': list(start_coords),
+        'end': list(end_coords),
+        'zoom': zoom,
+        'precision': precision,
+        'routes': {
+            mode: encoded.get(OSRM_PROFILES[mode], straight_line)
+            for mode, _ in ROUTE_MODES
+        }
+    }
+
+def _timed_route_weather(start, end):
+    with phase('weather'):
+        return route_weather(start, end)
+
+def _weather_result(future, budget_ends):
+    """
+    route_weather result from the routing pool, or None if it failed or is
+    still running when the route options budget (a time.monotonic() deadline) ends
+    """
+    try:
+        return future.result(timeout=max(0.0, budget_ends - time.monotonic()))
+    except Exception:
+        return None
+
+def compare_routes(start, end):
+    """
+    Geocode both addresses and compare every transport mode
+
+    Raises:
+        ValueError: If either address cannot be found
+    """
+    start_coords = geocode(start)
+    if not start_coords:
+        raise ValueError(f'Could not find "{start}". Try a more specific address.')
+    end_coords = geocode(end)
+    if not end_coords:
+        raise ValueError(f'Could not find "{end}". Try a more specific address.')
+    budget_ends = time.monotonic() + Config.ROUTE_OPTIONS_BUDGET
+    weather = _routing_pool.submit(propagate(_timed_route_weather), start_coords, end_coords)
+    route_options = get_route_options(start, end, start_coords, end_coords)
     return {
-        'walking':  {'distance': distance, 'duration': distance * 12, 'emissions': calculate_carbon_emissions('walking', distance)},
-        'biking':   {'distance': distance, 'duration': distance * 4,  'emissions': calculate_carbon_emissions('biking', distance)},
-        'bus':      {'distance': distance * 1.2, 'duration': distance * 3 + 10, 'emissions': calculate_carbon_emissions('bus', distance * 1.2)},
-        'train':    {'distance': distance * 1.3, 'duration': distance * 2 + 15, 'emissions': calculate_carbon_emissions('train', distance * 1.3)},
-        'car':      {'distance': distance, 'duration': distance * 1.5, 'emissions': calculate_carbon_emissions('car_medium', distance)},
-        'rideshare':{'distance': distance, 'duration': distance * 1.5 + 5, 'emissions': calculate_carbon_emissions('rideshare', distance)},
+        'start': start,
+        'end': end,
+        'start_coords': list(start_coords),
+        'end_coords': list(end_coords),
+        'region': region_for(start_coords),
+        'route_options': route_options,
+        'weather': _weather_result(weather, budget_ends)
     }
 
+def _route_comparison_job(params):
+    return compare_routes(params['start'], params['end'])
+
+def submit_route_comparison(start, end):
+    """Queue a comparison, joining an identical one already in flight; returns (job, created)"""
+    return job_queue.submit(
+        'route_comparison', {'start': start, 'end': end},
+        key=f'{normalize_address(start)}|{normalize_address(end)}'
+    )
+
 def init_routes(app, db):
+    job_queue.register('route_comparison', _route_comparison_job)
+    job_queue.init_app(app)
+
     @app.route('/')
     def index():
         return render_template('index.html')
@@ -136,11 +472,11 @@ def init_routes(app, db):
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        saved_routes = SavedRoute.query.filter_by(user_id=current_user.id).all()
-        total_carbon_saved = sum([route.carbon_saved for route in saved_routes])
+        stats = get_user_stats(current_user.id)
         return render_template('dashboard.html',
-                               saved_routes=saved_routes,
-                               total_carbon_saved=total_carbon_saved)
+                               total_carbon_saved=stats['total_carbon_saved'],
+                               total_routes=stats['total_routes'],
+                               transport_modes=stats['transport_modes'])
 
     @app.route('/route', methods=['GET', 'POST'])
     @app.route('/route', methods=['GET', 'POST'])
@@ -153,53 +489,58 @@ def init_routes(app, db):
                 flash('Please enter both a start and destination.')
                 return redirect(url_for('route_comparison'))
 
-            start_coords = geocode(start)
-            end_coords = geocode(end)
-
-            if not start_coords:
-                flash(f'Could not find "{start}". Try a more specific address.')
+            if Config.ROUTE_STREAMING:
+                # The page renders each mode from /api/route_options/stream as it arrives
+                return render_template('route_comparison.html', start=start, end=end,
+                                       stream=True, modes=[mode for mode, _ in ROUTE_MODES])
+
+            if Config.ROUTE_JOBS:
+                try:
+                    job, _ = submit_route_comparison(start, end)
+                except QueueFullError:
+                    flash('We are busy right now. Please try again in a moment.')
+                    return render_template('route_comparison.html', start=start, end=end)
+                return redirect(url_for('route_comparison', job=job['id']))
+
+            try:
+                comparison = compare_routes(start, end)
+            except ValueError as e:
+                flash(str(e))
                 return render_template('route_comparison.html', start=start, end=end)
-
-            if not end_coords:
-                flash(f'Could not find "{end}". Try a more specific address.')
-                return render_template('route_comparison.html', start=start, end=end)
-
-            route_options = get_route_options(start, end)
             return render_template('route_comparison.html',
                                    start=start, end=end,
-                                   route_options=route_options)
+                                   route_options=comparison['route_options'],
+                                   weather=comparison['weather'])
+
+        job_id = request.args.get('job')
+        if job_id:
+            job = job_queue.get(job_id)
+            if job is None:
+                flash('That comparison has expired. Please search again.')
+                return redirect(url_for('route_comparison'))
+            start, end = job['params']['start'], job['params']['end']
+            if job['status'] == FAILED:
+                flash(job['error'])
+                return render_template('route_comparison.html', start=start, end=end)
+            if job['status'] == DONE:
+                return render_template('route_comparison.html',
+                                       start=start, end=end,
+                                       route_options=job['result']['route_options'],
+                                       weather=job['result'].get('weather'))
+            return render_template('route_comparison.html', start=start, end=end, job_id=job_id)
         return render_template('route_comparison.html')
 
     @app.route('/profile')
     @login_required
     def profile():
-        saved_routes = SavedRoute.query.filter_by(user_id=current_user.id).all()
-        total_carbon_saved = sum(r.carbon_saved for r in saved_routes)
-        total_routes = len(saved_routes)
-
-        transport_modes = {}
-        for r in saved_routes:
-            transport_modes[r.transport_mode] = transport_modes.get(r.transport_mode, 0) + 1
-
-        carbon_kg = total_carbon_saved / 1000
-
-        all_achievements = [
-            {'id': 'carbon_1kg',   'name': 'Carbon Cutter',       'description': 'Save 1kg of CO2',               'unlocked': carbon_kg >= 1},
-            {'id': 'carbon_10kg',  'name': 'Climate Guardian',     'description': 'Save 10kg of CO2',              'unlocked': carbon_kg >= 10},
-            {'id': 'carbon_100kg', 'name': 'Earth Defender',       'description': 'Save 100kg of CO2',             'unlocked': carbon_kg >= 100},
-            {'id': 'routes_5',     'name': 'Eco Commuter',         'description': 'Take 5 eco-friendly routes',    'unlocked': total_routes >= 5},
-            {'id': 'routes_20',    'name': 'Green Navigator',      'description': 'Take 20 eco-friendly routes',   'unlocked': total_routes >= 20},
-            {'id': 'routes_50',    'name': 'Sustainable Explorer', 'description': 'Take 50 eco-friendly routes',   'unlocked': total_routes >= 50},
-            {'id': 'walking_5',    'name': 'Walker',               'description': 'Walk for 5 journeys',           'unlocked': transport_modes.get('walking', 0) >= 5},
-            {'id': 'biking_5',     'name': 'Cyclist',              'description': 'Cycle for 5 journeys',          'unlocked': transport_modes.get('biking', 0) >= 5},
-            {'id': 'bus_5',        'name': 'Bus Patron',           'description': 'Take the bus for 5 journeys',   'unlocked': transport_modes.get('bus', 0) >= 5},
-            {'id': 'train_5',      'name': 'Train Traveler',       'description': 'Take the train for 5 journeys', 'unlocked': transport_modes.get('train', 0) >= 5},
-        ]
+        stats = get_user_stats(current_user.id)
+        carbon_kg = stats['total_carbon_saved'] / 1000
+        all_achievements = evaluate_achievements(stats)
 
         carbon_stats = {
-            'total_carbon_saved': total_carbon_saved,
-            'total_routes': total_routes,
-            'transport_modes': transport_modes,
+            'total_carbon_saved': stats['total_carbon_saved'],
+            'total_routes': stats['total_routes'],
+            'transport_modes': stats['transport_modes'],
             'carbon_offset': round(carbon_kg, 2),
             'energy_saved': round(carbon_kg * 3.6, 2),
         }
@@ -226,34 +567,168 @@ def init_routes(app, db):
     @app.route('/api/save_route', methods=['POST'])
     @login_required
     def save_route():
-        data = request.get_json()
-        route = Route.query.filter_by(
-            start_location=data.get('start'),
-            end_location=data.get('end')
-        ).first()
-        if not route:
-            route = Route(
-                start_location=data.get('start'),
-                end_location=data.get('end'),
-                distance=data.get('distance')
-            )
-            db.session.add(route)
-            db.session.commit()
-
-        saved_route = SavedRoute(
-            user_id=current_user.id,
-            route_id=route.id,
-            transport_mode=data.get('transport_mode'),
-            carbon_saved=data.get('carbon_saved')
-        )
-        db.session.add(saved_route)
-        db.session.commit()
+        try:
+            trip = parse_trip(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        save_trips(current_user.id, [trip])
         return jsonify({'success': True})
 
+    @app.route('/api/save_routes', methods=['POST'])
+    @login_required
+    def save_routes():
+        data = request.get_json(silent=True) or {}
+        items = data.get('routes')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Expected a non-empty "routes" list'}), 400
+        if len(items) > Config.SAVE_BATCH_MAX:
+            return jsonify({'error': f'At most {Config.SAVE_BATCH_MAX} routes per request'}), 400
+
+        results = []
+        trips = []
+        for index, item in enumerate(items):
+            try:
+                trips.append(parse_trip(item))
+                results.append({'index': index, 'success': True})
+            except ValueError as e:
+                results.append({'index': index, 'success': False, 'error': str(e)})
+
+        saved_ids = iter(save_trips(current_user.id, trips))
+        for result in results:
+            if result['success']:
+                result['id'] = next(saved_ids)
+
+        return jsonify({
+            'saved': len(trips),
+            'failed': len(items) - len(trips),
+            'results': results
+        })
+
+    @app.route('/api/saved_routes')
+    @login_required
+    def api_saved_routes():
+        limit = request.args.get('limit', 20, type=int)
+        ascending = request.args.get('order', 'desc') == 'asc'
+        try:
+            page = get_saved_routes_page(current_user.id, limit,
+                                         request.args.get('cursor'), ascending)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify(page)
+
+    @app.route('/api/savings_series')
+    @login_required
+    def api_savings_series():
+        try:
+            start = request.args.get('from')
+            end = request.args.get('to')
+            return jsonify(get_savings_series(
+                current_user.id,
+                request.args.get('bucket', 'day'),
+                date.fromisoformat(start) if start else None,
+                date.fromisoformat(end) if end else None
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     @app.route('/api/route_options')
     def api_route_options():
         start = request.args.get('start')
         end = request.args.get('end')
         if not start or not end:
             return jsonify({'error': 'Missing parameters'}), 400
-        return jsonify(get_route_options(start, end))
+        options = get_route_options(start, end)
+        if options is None:
+            return jsonify({'error': 'Could not find one of the locations'}), 404
+        return jsonify(options)
+
+    @app.route('/api/route_options/stream')
+    def api_route_options_stream():
+        start = request.args.get('start', '').strip()
+        end = request.args.get('end', '').strip()
+        if not start or not end:
+            return jsonify({'error': 'Missing parameters'}), 400
+        return Response(
+            stream_with_context(stream_route_options(start, end)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/route_options/batch', methods=['POST'])
+    def api_route_options_batch():
+        data = request.get_json(silent=True) or {}
+        pairs = data.get('pairs')
+        if not isinstance(pairs, list) or not pairs:
+            return jsonify({'error': 'Expected a non-empty "pairs" list'}), 400
+        if len(pairs) > Config.BATCH_MAX_PAIRS:
+            return jsonify({'error': f'At most {Config.BATCH_MAX_PAIRS} pairs per request'}), 400
+
+        cleaned = []
+        for index, pair in enumerate(pairs):
+            start = str(pair.get('start', '')).strip() if isinstance(pair, dict) else ''
+            end = str(pair.get('end', '')).strip() if isinstance(pair, dict) else ''
+            if not start or not end:
+                return jsonify({'error': f'Pair {index} needs a start and end'}), 400
+            cleaned.append((start, end))
+        return jsonify(get_batch_route_options(cleaned))
+
+    @app.route('/api/route_geometry')
+    def api_route_geometry():
+        start = request.args.get('start')
+        end = request.args.get('end')
+        if not start or not end:
+            return jsonify({'error': 'Missing parameters'}), 400
+        zoom = request.args.get('zoom', type=int)
+        if zoom is not None and not 0 <= zoom <= MAX_ZOOM:
+            return jsonify({'error': f'zoom must be between 0 and {MAX_ZOOM}'}), 400
+        precision = request.args.get('precision', 5, type=int)
+        if precision not in (5, 6):
+            return jsonify({'error': 'precision must be 5 or 6'}), 400
+
+        start_coords = geocode(start)
+        end_coords = geocode(end)
+        if not start_coords or not end_coords:
+            return jsonify({'error': 'Could not find one of the locations'}), 404
+        return jsonify(get_route_geometries(start_coords, end_coords, zoom, precision))
+
+    @app.route('/api/route_jobs', methods=['POST'])
+    def api_route_jobs():
+        data = request.get_json(silent=True) or {}
+        start = str(data.get('start') or '').strip()
+        end = str(data.get('end') or '').strip()
+        if not start or not end:
+            return jsonify({'error': 'Missing start or end'}), 400
+        try:
+            job, created = submit_route_comparison(start, end)
+        except QueueFullError:
+            return jsonify({'error': 'Too many comparisons queued, retry later'}), 503
+        return jsonify({
+            'job_id': job['id'],
+            'status': job['status'],
+            'coalesced': not created,
+            'url': url_for('api_job', job_id=job['id'])
+        }), 202
+
+    @app.route('/api/jobs/<job_id>')
+    def api_job(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
+    @app.route('/api/autocomplete')
+    def api_autocomplete():
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', 8, type=int), 1), MAX_SUGGESTIONS)
+        autocomplete_index.sync()
+        return jsonify({'query': query, 'suggestions': autocomplete_index.search(query, limit)})
+
+    @app.route('/api/cache_stats')
+    def api_cache_stats():
+        return jsonify(cache_stats())
+
+    @app.route('/api/providers')
+    def api_providers():
+        status = provider_status()
+        status['weather'] = weather_provider_status()
+        return jsonify(status)
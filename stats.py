@@ -0,0 +1,289 @@
+"""
+Carbon statistics for Eco-Go
+Per-user aggregates kept in UserStats/UserModeStats and daily rollups in
+DailySavings, updated in the same transaction as each saved route so reads
+never scan a user's history
+"""
+from datetime import timedelta
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from extensions import db
+from models import SavedRoute, UserStats, UserModeStats, DailySavings, insert_ignore
+
+SERIES_BUCKETS = ('day', 'week', 'month')
+
+# Achievements unlocked by UserStats thresholds. 'metric' is 'carbon_kg',
+# 'total_routes' or 'mode:<transport_mode>'.
+ACHIEVEMENTS = [
+    {'id': 'carbon_1kg',   'name': 'Carbon Cutter',        'description': 'Save 1kg of CO2',               'icon': 'leaf',       'metric': 'carbon_kg',    'threshold': 1},
+    {'id': 'carbon_10kg',  'name': 'Climate Guardian',     'description': 'Save 10kg of CO2',              'icon': 'tree',       'metric': 'carbon_kg',    'threshold': 10},
+    {'id': 'carbon_100kg', 'name': 'Earth Defender',       'description': 'Save 100kg of CO2',             'icon': 'globe',      'metric': 'carbon_kg',    'threshold': 100},
+    {'id': 'routes_5',     'name': 'Eco Commuter',         'description': 'Take 5 eco-friendly routes',    'icon': 'route',      'metric': 'total_routes', 'threshold': 5},
+    {'id': 'routes_20',    'name': 'Green Navigator',      'description': 'Take 20 eco-friendly routes',   'icon': 'compass',    'metric': 'total_routes', 'threshold': 20},
+    {'id': 'routes_50',    'name': 'Sustainable Explorer', 'description': 'Take 50 eco-friendly routes',   'icon': 'map-marked', 'metric': 'total_routes', 'threshold': 50},
+    {'id': 'walking_5',    'name': 'Walker',               'description': 'Walk for 5 journeys',           'icon': 'walking',    'metric': 'mode:walking', 'threshold': 5},
+    {'id': 'biking_5',     'name': 'Cyclist',              'description': 'Cycle for 5 journeys',          'icon': 'bicycle',    'metric': 'mode:biking',  'threshold': 5},
+    {'id': 'bus_5',        'name': 'Bus Patron',           'description': 'Take the bus for 5 journeys',   'icon': 'bus',        'metric': 'mode:bus',     'threshold': 5},
+    {'id': 'train_5',      'name': 'Train Traveler',       'description': 'Take the train for 5 journeys', 'icon': 'train',      'metric': 'mode:train',   'threshold': 5},
+]
+
+
+def record_trips(user_id, trips):
+    """
+    Add saved trips to a user's running totals. Does not commit, so the
+    update lands in the same transaction as the SavedRoute rows.
+
+    Args:
+        user_id (int): Owner of the trips
+        trips (list): [(transport_mode, carbon_saved, date_saved), ...]
+    """
+    if not trips:
+        return
+
+    mode_counts = {}
+    daily = {}
+    for transport_mode, carbon_saved, date_saved in trips:
+        mode_counts[transport_mode] = mode_counts.get(transport_mode, 0) + 1
+        saved, count = daily.get((date_saved.date(), transport_mode), (0, 0))
+        daily[(date_saved.date(), transport_mode)] = (saved + (carbon_saved or 0), count + 1)
+    total_saved = sum(carbon_saved or 0 for _, carbon_saved, _ in trips)
+    latest = max(date_saved for _, _, date_saved in trips)
+
+    insert_ignore(UserStats, {'user_id': user_id, 'total_carbon_saved': 0, 'route_count': 0})
+    db.session.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            total_carbon_saved=UserStats.total_carbon_saved + total_saved,
+            route_count=UserStats.route_count + len(trips),
+            last_trip_at=case(
+                (or_(UserStats.last_trip_at.is_(None), UserStats.last_trip_at < latest), latest),
+                else_=UserStats.last_trip_at
+            )
+        )
+    )
+
+    insert_ignore(UserModeStats, [
+        {'user_id': user_id, 'transport_mode': mode, 'route_count': 0} for mode in mode_counts
+    ])
+    for mode, count in mode_counts.items():
+        db.session.execute(
+            update(UserModeStats)
+            .where(UserModeStats.user_id == user_id, UserModeStats.transport_mode == mode)
+            .values(route_count=UserModeStats.route_count + count)
+        )
+
+    insert_ignore(DailySavings, [
+        {'user_id': user_id, 'day': day, 'transport_mode': mode, 'carbon_saved': 0, 'route_count': 0}
+        for day, mode in daily
+    ])
+    for (day, mode), (saved, count) in daily.items():
+        db.session.execute(
+            update(DailySavings)
+            .where(DailySavings.user_id == user_id,
+                   DailySavings.day == day,
+                   DailySavings.transport_mode == mode)
+            .values(carbon_saved=DailySavings.carbon_saved + saved,
+                    route_count=DailySavings.route_count + count)
+        )
+
+
+def record_trip(user_id, transport_mode, carbon_saved, date_saved):
+    """Add one saved trip to a user's running totals, see record_trips"""
+    record_trips(user_id, [(transport_mode, carbon_saved, date_saved)])
+
+
+def rebuild_user_stats(user_id=None):
+    """
+    Recompute UserStats and UserModeStats from SavedRoute. Does not commit.
+
+    Args:
+        user_id (int, optional): Rebuild only this user; all users if omitted
+    """
+    stats_delete = delete(UserStats)
+    modes_delete = delete(UserModeStats)
+    totals = select(
+        SavedRoute.user_id,
+        func.coalesce(func.sum(SavedRoute.carbon_saved), 0),
+        func.count(SavedRoute.id),
+        func.max(SavedRoute.date_saved)
+    ).where(SavedRoute.user_id.isnot(None)).group_by(SavedRoute.user_id)
+    modes = select(
+        SavedRoute.user_id,
+        SavedRoute.transport_mode,
+        func.count(SavedRoute.id)
+    ).where(SavedRoute.user_id.isnot(None)).group_by(SavedRoute.user_id, SavedRoute.transport_mode)
+
+    if user_id is not None:
+        stats_delete = stats_delete.where(UserStats.user_id == user_id)
+        modes_delete = modes_delete.where(UserModeStats.user_id == user_id)
+        totals = totals.where(SavedRoute.user_id == user_id)
+        modes = modes.where(SavedRoute.user_id == user_id)
+
+    db.session.execute(stats_delete)
+    db.session.execute(modes_delete)
+    db.session.execute(insert(UserStats).from_select(
+        ['user_id', 'total_carbon_saved', 'route_count', 'last_trip_at'], totals
+    ))
+    db.session.execute(insert(UserModeStats).from_select(
+        ['user_id', 'transport_mode', 'route_count'], modes
+    ))
+    if user_id is not None:
+        # Users without trips still get a row, so they are not rebuilt on every read
+        insert_ignore(UserStats, {'user_id': user_id, 'total_carbon_saved': 0, 'route_count': 0})
+
+
+def _ensure_aggregates(user_id):
+    """
+    Load a user's UserStats row, building all of their aggregates first if
+    they have never been built (e.g. a database from before they existed)
+    """
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        rebuild_daily_savings(user_id)
+        db.session.commit()
+        stats = db.session.get(UserStats, user_id)
+    return stats
+
+
+def get_user_stats(user_id):
+    """
+    A user's carbon totals, read from the maintained aggregates
+
+    Returns:
+        dict: total_carbon_saved (grams), total_routes, transport_modes, last_trip_at
+    """
+    stats = _ensure_aggregates(user_id)
+
+    mode_rows = db.session.query(UserModeStats.transport_mode, UserModeStats.route_count)\
+        .filter(UserModeStats.user_id == user_id)\
+        .all()
+
+    return {
+        'total_carbon_saved': stats.total_carbon_saved,
+        'total_routes': stats.route_count,
+        'transport_modes': {mode: count for mode, count in mode_rows if count},
+        'last_trip_at': stats.last_trip_at
+    }
+
+
+def evaluate_achievements(stats):
+    """
+    Check every achievement threshold against get_user_stats() output
+
+    Returns:
+        list: Achievement dicts with an 'unlocked' flag, in ACHIEVEMENTS order
+    """
+    metrics = {
+        'carbon_kg': stats['total_carbon_saved'] / 1000,
+        'total_routes': stats['total_routes'],
+    }
+    achievements = []
+    for achievement in ACHIEVEMENTS:
+        metric = achievement['metric']
+        if metric.startswith('mode:'):
+            value = stats['transport_modes'].get(metric[len('mode:'):], 0)
+        else:
+            value = metrics[metric]
+        achievements.append({
+            'id': achievement['id'],
+            'name': achievement['name'],
+            'description': achievement['description'],
+            'icon': achievement['icon'],
+            'unlocked': value >= achievement['threshold']
+        })
+    return achievements
+
+
+def rebuild_daily_savings(user_id=None):
+    """
+    Recompute the DailySavings rollups from SavedRoute. Does not commit.
+
+    Args:
+        user_id (int, optional): Rebuild only this user; all users if omitted
+    """
+    day = func.date(SavedRoute.date_saved)
+    rollup_delete = delete(DailySavings)
+    rollups = select(
+        SavedRoute.user_id,
+        day,
+        SavedRoute.transport_mode,
+        func.coalesce(func.sum(SavedRoute.carbon_saved), 0),
+        func.count(SavedRoute.id)
+    )\
+    .where(SavedRoute.user_id.isnot(None), SavedRoute.date_saved.isnot(None))\
+    .group_by(SavedRoute.user_id, day, SavedRoute.transport_mode)
+
+    if user_id is not None:
+        rollup_delete = rollup_delete.where(DailySavings.user_id == user_id)
+        rollups = rollups.where(SavedRoute.user_id == user_id)
+
+    db.session.execute(rollup_delete)
+    db.session.execute(insert(DailySavings).from_select(
+        ['user_id', 'day', 'transport_mode', 'carbon_saved', 'route_count'], rollups
+    ))
+
+
+def _bucket_start(day, bucket):
+    """First day of the bucket containing a date"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_savings_series(user_id, bucket='day', start=None, end=None):
+    """
+    Carbon saved per day, week or month from the DailySavings rollups
+
+    Args:
+        user_id (int): Owner of the savings
+        bucket (str): 'day', 'week' (starting Monday) or 'month'
+        start (date, optional): First day included
+        end (date, optional): Last day included
+
+    Returns:
+        dict: 'series' of {period, carbon_saved, route_count} oldest first, and
+        'starting_total', the carbon saved before start (for cumulative charts)
+    """
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f'bucket must be one of {", ".join(SERIES_BUCKETS)}')
+    _ensure_aggregates(user_id)
+
+    query = db.session.query(
+        DailySavings.day,
+        func.sum(DailySavings.carbon_saved),
+        func.sum(DailySavings.route_count)
+    )\
+    .filter(DailySavings.user_id == user_id)
+    if start:
+        query = query.filter(DailySavings.day >= start)
+    if end:
+        query = query.filter(DailySavings.day <= end)
+    rows = query.group_by(DailySavings.day).order_by(DailySavings.day).all()
+
+    buckets = {}
+    for day, carbon_saved, route_count in rows:
+        period = _bucket_start(day, bucket)
+        saved, count = buckets.get(period, (0.0, 0))
+        buckets[period] = (saved + float(carbon_saved), count + int(route_count))
+
+    starting_total = 0.0
+    if start:
+        starting_total = db.session.query(func.coalesce(func.sum(DailySavings.carbon_saved), 0))\
+            .filter(DailySavings.user_id == user_id, DailySavings.day < start)\
+            .scalar()
+
+    return {
+        'bucket': bucket,
+        'starting_total': float(starting_total),
+        'series': [
+            {
+                'period': period.strftime('%Y-%m') if bucket == 'month' else period.isoformat(),
+                'carbon_saved': saved,
+                'route_count': count
+            }
+            for period, (saved, count) in sorted(buckets.items())
+        ]
+    }
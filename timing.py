@@ -0,0 +1,220 @@
+"""
+Request timing for Eco-Go
+Splits each request into phases (geocode, route_<profile>, table_<profile>,
+weather, db, render) plus its total, reports them in a Server-Timing response
+header and aggregates them into Prometheus histograms served at
+Config.METRICS_PATH. Phases run on the routing pool count against the request
+that submitted them, so parallel phases can add up to more than the total.
+With Config.REQUEST_TIMING off no hooks are installed and phase() is a shared
+no-op context manager.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
+from functools import partial
+from flask import Response, g, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import Config
+
+_current = contextvars.ContextVar('request_timer', default=None)
+_NO_PHASE = nullcontext()
+
+
+class RequestTimer:
+    """Accumulated seconds and call count per phase for one request"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._render_started = []
+
+    def add(self, name, seconds):
+        with self._lock:
+            total = self.phases.get(name)
+            self.phases[name] = (total[0] + seconds, total[1] + 1) if total else (seconds, 1)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds"""
+        with self._lock:
+            phases = sorted(self.phases.items())
+        metrics = [f'{name};dur={seconds * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else '')
+                   for name, (seconds, count) in phases]
+        metrics.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def phase(name):
+    """
+    Context manager timing a block as phase `name` of the current request
+
+    Outside a timed request (timing disabled, background jobs, CLI) this is a
+    shared no-op.
+    """
+    timer = _current.get()
+    return _Phase(timer, name) if timer is not None else _NO_PHASE
+
+
+def propagate(fn):
+    """
+    fn bound to the current request's timer, for running on another thread
+    (e.g. _routing_pool.submit(propagate(fn), ...)); fn itself when not timing
+    """
+    if _current.get() is None:
+        return fn
+    return partial(contextvars.copy_context().run, fn)
+
+
+class Histogram:
+    """Prometheus histogram with a fixed set of label names"""
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = sorted(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last is +Inf only), then sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        """Lines in the Prometheus text exposition format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float('inf')], counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'ecogo_request_duration_seconds', 'Request duration, including any streamed body',
+    ('method', 'endpoint', 'status'), Config.TIMING_BUCKETS
+)
+PHASE_DURATION = Histogram(
+    'ecogo_request_phase_duration_seconds', 'Time spent per request in each phase',
+    ('endpoint', 'phase'), Config.TIMING_BUCKETS
+)
+
+
+def render_metrics():
+    """Every histogram in the Prometheus text format"""
+    return '\n'.join(REQUEST_DURATION.render() + PHASE_DURATION.render()) + '\n'
+
+
+def _start_request():
+    timer = RequestTimer()
+    g._request_timer = timer
+    _current.set(timer)
+
+
+def _finish_response(response):
+    timer = g.get('_request_timer')
+    if timer is not None:
+        g._request_status = response.status_code
+        if Config.SERVER_TIMING_HEADER:
+            response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+
+def _finish_request(exc):
+    # Runs after a streamed body has been sent, so its phases and duration are included
+    timer = g.pop('_request_timer', None)
+    _current.set(None)
+    if timer is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    status = g.pop('_request_status', 500 if exc is not None else 200)
+    REQUEST_DURATION.observe((request.method, endpoint, str(status)), timer.elapsed())
+    for name, (seconds, _) in timer.phases.items():
+        PHASE_DURATION.observe((endpoint, name), seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('_timing_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _current.get()
+    started = conn.info.get('_timing_started')
+    if timer is not None and started:
+        timer.add('db', time.perf_counter() - started.pop())
+
+
+def _handle_db_error(context):
+    started = context.connection.info.get('_timing_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    timer = _current.get()
+    if timer is not None:
+        timer._render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timer = _current.get()
+    if timer is not None and timer._render_started:
+        timer.add('render', time.perf_counter() - timer._render_started.pop())
+
+
+def init_timing(app):
+    """Install the timing hooks and the metrics endpoint; does nothing when Config.REQUEST_TIMING is off"""
+    if not Config.REQUEST_TIMING:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_response)
+    app.teardown_request(_finish_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_db_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.route(Config.METRICS_PATH)
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
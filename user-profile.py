@@ -4,7 +4,8 @@ Handles user preferences, achievements, and profile management
 """
 from models import User, SavedRoute, db
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from sqlalchemy.orm import joinedload
+from stats import get_user_stats, evaluate_achievements, get_savings_series
 import json
 
 class UserProfile:
@@ -29,19 +30,8 @@ class UserProfile:
     def get_carbon_stats(self):
         """Get user's carbon savings statistics"""
 
-        total_saved = db.session.query(func.sum(SavedRoute.carbon_saved))\
-            .filter(SavedRoute.user_id == self.user_id)\
-            .scalar() or 0
-            
-        transport_counts = db.session.query(
-            SavedRoute.transport_mode, 
-            func.count(SavedRoute.id)
-        )\
-        .filter(SavedRoute.user_id == self.user_id)\
-        .group_by(SavedRoute.transport_mode)\
-        .all()
-        
-        transport_modes = {mode: count for mode, count in transport_counts}
+        stats = get_user_stats(self.user_id)
+        total_saved = stats['total_carbon_saved']
         
         monthly_data = self._get_monthly_carbon_data()
         
@@ -51,8 +41,8 @@ class UserProfile:
         
         return {
             'total_carbon_saved': total_saved,
-            'total_routes': sum(transport_modes.values()),
-            'transport_modes': transport_modes,
+            'total_routes': stats['total_routes'],
+            'transport_modes': stats['transport_modes'],
             'monthly_data': monthly_data,
             'environmental_impact': {
                 'tree_days': tree_days,
@@ -64,25 +54,15 @@ class UserProfile:
     def _get_monthly_carbon_data(self):
         """Get carbon savings data by month for the past year"""
         
-        start_date = datetime.now() - timedelta(days=365)
+        start_date = (datetime.now() - timedelta(days=365)).date()
+        series = get_savings_series(self.user_id, 'month', start=start_date)['series']
         
-        monthly_data = db.session.query(
-            func.strftime('%Y-%m', SavedRoute.date_saved).label('month'),
-            func.sum(SavedRoute.carbon_saved).label('carbon_saved')
-        )\
-        .filter(and_(
-            SavedRoute.user_id == self.user_id,
-            SavedRoute.date_saved >= start_date
-        ))\
-        .group_by('month')\
-        .order_by('month')\
-        .all()
-        
-        return {month: float(carbon_saved) for month, carbon_saved in monthly_data}
+        return {point['period']: point['carbon_saved'] for point in series}
     
     def get_recent_routes(self, limit=5):
         """Get user's most recent routes"""
         recent_routes = SavedRoute.query\
+            .options(joinedload(SavedRoute.route))\
             .filter(SavedRoute.user_id == self.user_id)\
             .order_by(SavedRoute.date_saved.desc())\
             .limit(limit)\
@@ -104,182 +84,9 @@ class UserProfile:
     
     def get_achievements(self):
         """Get user's environmental achievements"""
-        stats = self.get_carbon_stats()
-        
-        achievements = []
-        
-        carbon_kg = stats['total_carbon_saved'] / 1000
-        if carbon_kg >= 1:
-            achievements.append({
-                'id': 'carbon_1kg',
-                'name': 'Carbon Cutter',
-                'description': 'Save 1kg of carbon emissions',
-                'unlocked': True,
-                'icon': 'leaf'
-            })
-        if carbon_kg >= 10:
-            achievements.append({
-                'id': 'carbon_10kg',
-                'name': 'Climate Guardian',
-                'description': 'Save 10kg of carbon emissions',
-                'unlocked': True,
-                'icon': 'tree'
-            })
-        if carbon_kg >= 100:
-            achievements.append({
-                'id': 'carbon_100kg',
-                'name': 'Earth Defender',
-                'description': 'Save 100kg of carbon emissions',
-                'unlocked': True,
-                'icon': 'globe'
-            })
-            
-        route_count = stats['total_routes']
-        if route_count >= 5:
-            achievements.append({
-                'id': 'routes_5',
-                'name': 'Eco Commuter',
-                'description': 'Take 5 eco-friendly routes',
-                'unlocked': True,
-                'icon': 'route'
-            })
-        if route_count >= 20:
-            achievements.append({
-                'id': 'routes_20',
-                'name': 'Green Navigator',
-                'description': 'Take 20 eco-friendly routes',
-                'unlocked': True,
-                'icon': 'compass'
-            })
-        if route_count >= 50:
-            achievements.append({
-                'id': 'routes_50',
-                'name': 'Sustainable Explorer',
-                'description': 'Take 50 eco-friendly routes',
-                'unlocked': True,
-                'icon': 'map-marked'
-            })
-            
-        if stats['transport_modes'].get('walking', 0) >= 5:
-            achievements.append({
-                'id': 'walking_5',
-                'name': 'Walker',
-                'description': 'Walk for 5 journeys',
-                'unlocked': True,
-                'icon': 'walking'
-            })
-        if stats['transport_modes'].get('biking', 0) >= 5:
-            achievements.append({
-                'id': 'biking_5',
-                'name': 'Cyclist',
-                'description': 'Cycle for 5 journeys',
-                'unlocked': True,
-                'icon': 'bicycle'
-            })
-        if stats['transport_modes'].get('bus', 0) >= 5:
-            achievements.append({
-                'id': 'bus_5',
-                'name': 'Bus Patron',
-                'description': 'Take the bus for 5 journeys',
-                'unlocked': True,
-                'icon': 'bus'
-            })
-        if stats['transport_modes'].get('train', 0) >= 5:
-            achievements.append({
-                'id': 'train_5',
-                'name': 'Train Traveler',
-                'description': 'Take the train for 5 journeys',
-                'unlocked': True,
-                'icon': 'train'
-            })
-            
-        all_achievements = self._get_all_achievements()
-        unlocked_ids = [a['id'] for a in achievements]
-        
-        for achievement in all_achievements:
-            if achievement['id'] not in unlocked_ids:
-                achievement['unlocked'] = False
-                achievements.append(achievement)
-                
+        achievements = evaluate_achievements(get_user_stats(self.user_id))
         return sorted(achievements, key=lambda x: (not x['unlocked'], x['name']))
     
-    def _get_all_achievements(self):
-        """Get list of all possible achievements"""
-        return [
-            {
-                'id': 'carbon_1kg',
-                'name': 'Carbon Cutter',
-                'description': 'Save 1kg of carbon emissions',
-                'icon': 'leaf'
-            },
-            {
-                'id': 'carbon_10kg',
-                'name': 'Climate Guardian',
-                'description': 'Save 10kg of carbon emissions',
-                'icon': 'tree'
-            },
-            {
-                'id': 'carbon_100kg',
-                'name': 'Earth Defender',
-                'description': 'Save 100kg of carbon emissions',
-                'icon': 'globe'
-            },
-            {
-                'id': 'routes_5',
-                'name': 'Eco Commuter',
-                'description': 'Take 5 eco-friendly routes',
-                'icon': 'route'
-            },
-            {
-                'id': 'routes_20',
-                'name': 'Green Navigator',
-                'description': 'Take 20 eco-friendly routes',
-                'icon': 'compass'
-            },
-            {
-                'id': 'routes_50',
-                'name': 'Sustainable Explorer',
-                'description': 'Take 50 eco-friendly routes',
-                'icon': 'map-marked'
-            },
-            {
-                'id': 'walking_5',
-                'name': 'Walker',
-                'description': 'Walk for 5 journeys',
-                'icon': 'walking'
-            },
-            {
-                'id': 'biking_5',
-                'name': 'Cyclist',
-                'description': 'Cycle for 5 journeys',
-                'icon': 'bicycle'
-            },
-            {
-                'id': 'bus_5',
-                'name': 'Bus Patron',
-                'description': 'Take the bus for 5 journeys',
-                'icon': 'bus'
-            },
-            {
-                'id': 'train_5',
-                'name': 'Train Traveler',
-                'description': 'Take the train for 5 journeys',
-                'icon': 'train'
-            },
-            {
-                'id': 'streak_7',
-                'name': 'Weekly Warrior',
-                'description': 'Use eco-friendly transport for 7 days in a row',
-                'icon': 'calendar-check'
-            },
-            {
-                'id': 'streak_30',
-                'name': 'Eco Enthusiast',
-                'description': 'Use eco-friendly transport for 30 days in a row',
-                'icon': 'calendar-alt'
-            }
-        ]
-    
     def update_preferences(self, preferences):
         """Update user preferences"""
         user = User.query.get(self.user_id)
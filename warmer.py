@@ -0,0 +1,167 @@
+"""
+Cache warmer for Eco-Go
+Refreshes geocode and route cache entries for the most active route pairs
+before they expire, so peak-hour comparisons are served from cache.
+Runs from `flask warm-cache` or a background thread (CACHE_WARM_INTERVAL).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from cache import geocode_cache, normalize_address, route_cache, route_cache_key
+from config import Config
+from extensions import db
+from http_client import http_client
+from models import Location, Route, SavedRoute
+from providers import geocode_address, route_profile
+
+logger = logging.getLogger(__name__)
+
+# Every distinct routing profile behind the transport modes (see routes.OSRM_PROFILES)
+WARM_PROFILES = ('foot', 'bike', 'car')
+
+
+def popular_route_pairs(limit, days):
+    """
+    Route pairs with the most SavedRoute activity in the last `days` days
+
+    Returns:
+        list: [(start name, end name, start (lat, lng) or None, end (lat, lng) or None, trips), ...]
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    activity = db.session.query(SavedRoute.route_id, func.count(SavedRoute.id).label('trips'))\
+        .filter(SavedRoute.date_saved >= since)\
+        .group_by(SavedRoute.route_id)\
+        .order_by(func.count(SavedRoute.id).desc())\
+        .limit(limit)\
+        .subquery()
+
+    start_place = db.aliased(Location)
+    end_place = db.aliased(Location)
+    rows = db.session.query(
+        Route.start_location, Route.end_location,
+        start_place.lat, start_place.lng, end_place.lat, end_place.lng,
+        activity.c.trips
+    ).join(activity, activity.c.route_id == Route.id)\
+        .outerjoin(start_place, Route.start_location_id == start_place.id)\
+        .outerjoin(end_place, Route.end_location_id == end_place.id)\
+        .order_by(activity.c.trips.desc())\
+        .all()
+
+    return [
+        (start, end,
+         (start_lat, start_lng) if start_lat is not None else None,
+         (end_lat, end_lng) if end_lat is not None else None,
+         trips)
+        for start, end, start_lat, start_lng, end_lat, end_lng, trips in rows
+    ]
+
+
+def _needs_refresh(entry, now, refresh_within):
+    return entry is None or entry[1] - now < refresh_within
+
+
+def warm_cache(budget=None, pairs=None, days=None, refresh_within=None):
+    """
+    Refresh cache entries for popular route pairs, most active first
+
+    Geocodes already stored on a Location are copied into the cache for free;
+    every other geocode or route lookup counts against the budget.
+
+    Args:
+        budget (int): Maximum upstream lookups this cycle
+        pairs (int): How many of the most active pairs to consider
+        days (int): Activity window in days
+        refresh_within (float): Refresh entries expiring within this many seconds
+
+    Returns:
+        dict: Counts of pairs seen, lookups made and entries already fresh
+    """
+    budget = Config.CACHE_WARM_BUDGET if budget is None else budget
+    pairs = pairs or Config.CACHE_WARM_PAIRS
+    days = days or Config.CACHE_WARM_DAYS
+    refresh_within = Config.CACHE_WARM_REFRESH_WITHIN if refresh_within is None else refresh_within
+
+    summary = {'pairs': 0, 'geocoded': 0, 'routed': 0, 'fresh': 0, 'failed': 0,
+               'calls': 0, 'budget': budget, 'budget_exhausted': False}
+
+    def spend():
+        if summary['calls'] >= budget:
+            summary['budget_exhausted'] = True
+            return False
+        summary['calls'] += 1
+        return True
+
+    def coordinates(address, known):
+        key = normalize_address(address)
+        entry = geocode_cache.get_entry(key)
+        if not _needs_refresh(entry, time.time(), refresh_within):
+            summary['fresh'] += 1
+            return tuple(entry[0])
+        coords = known
+        if coords is None:
+            if not spend():
+                return tuple(entry[0]) if entry else None
+            coords = geocode_address(address)
+            if coords is None:
+                summary['failed'] += 1
+                return tuple(entry[0]) if entry else None
+        geocode_cache.set(key, list(coords))
+        summary['geocoded'] += 1
+        return tuple(coords)
+
+    for start, end, start_known, end_known, _ in popular_route_pairs(pairs, days):
+        if summary['budget_exhausted']:
+            break
+        summary['pairs'] += 1
+        start_coords = coordinates(start, start_known)
+        end_coords = coordinates(end, end_known)
+        if not start_coords or not end_coords:
+            continue
+
+        for profile in WARM_PROFILES:
+            key = route_cache_key(profile, start_coords, end_coords, variant='polyline6')
+            if not _needs_refresh(route_cache.get_entry(key), time.time(), refresh_within):
+                summary['fresh'] += 1
+                continue
+            if not spend():
+                break
+            route = route_profile(start_coords, end_coords, profile)
+            if route and not route.get('estimate'):
+                route_cache.set(key, route)
+                summary['routed'] += 1
+            else:
+                summary['failed'] += 1
+
+    return summary
+
+
+def start_cache_warmer(app):
+    """
+    Run warm_cache every CACHE_WARM_INTERVAL seconds in a daemon thread
+
+    Every worker starts a thread, but a cycle only runs in the worker that
+    takes the shared once-per-interval slot, so workers do not multiply the
+    upstream budget.
+    """
+    interval = Config.CACHE_WARM_INTERVAL
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            if http_client.limiter.reserve('cache-warmer', interval, 1, 0) is None:
+                continue
+            try:
+                with app.app_context():
+                    summary = warm_cache()
+                    db.session.remove()
+                logger.info('Cache warm-up: %s', summary)
+            except Exception:
+                logger.exception('Cache warm-up failed')
+
+    thread = threading.Thread(target=run, name='cache-warmer', daemon=True)
+    thread.start()
+    return thread
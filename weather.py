@@ -0,0 +1,256 @@
+"""
+Weather for Eco-Go
+Current conditions and daily forecasts from the providers in
+Config.WEATHER_PROVIDERS, cached per WEATHER_TILE_DEGREES tile and time bucket
+so every user in the same tile shares one upstream fetch. Weather sampled along
+a route is turned into transport suggestions (e.g. bus rather than bike in rain).
+"""
+import hashlib
+import math
+from datetime import datetime, timedelta, timezone
+from cache import cached_weather, weather_tile
+from config import Config
+from http_client import http_client
+from providers import Provider, ProviderError, _first_result
+
+FORECAST_DAYS = 5
+
+# Conditions that make walking and cycling unpleasant, worst first
+WET_CONDITIONS = ('Thunderstorm', 'Snow', 'Rain', 'Drizzle')
+ACTIVE_MODES = ('walking', 'biking')
+SHELTERED_MODES = ('bus', 'train')
+COLD_TEMP = 0    # °C
+HOT_TEMP = 32    # °C
+WINDY_SPEED = 10  # m/s
+
+
+class WeatherProvider(Provider):
+    """
+    Base class for weather upstreams. Both operations take a (lat, lng) tile
+    centre and return normalized dicts: main, description, temp (°C),
+    humidity (%), wind_speed (m/s), precipitation (mm/h).
+    """
+    def supports(self, operation):
+        return getattr(type(self), operation) is not getattr(WeatherProvider, operation)
+
+    def current(self, coords):
+        """Current conditions, or None"""
+        raise NotImplementedError
+
+    def forecast(self, coords):
+        """FORECAST_DAYS daily conditions, each with a 'date' (YYYY-MM-DD), or None"""
+        raise NotImplementedError
+
+
+def _severity(condition):
+    main = condition.get('main')
+    return WET_CONDITIONS.index(main) if main in WET_CONDITIONS else len(WET_CONDITIONS)
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """OpenWeatherMap current weather and 5 day / 3 hour forecast"""
+    name = 'openweathermap'
+    base_url = 'https://api.openweathermap.org/data/2.5'
+
+    def available(self):
+        return Config.WEATHER_API_KEY not in ('', 'your-weather-api-key', 'demo_key')
+
+    def _get(self, endpoint, coords):
+        res = http_client.get(f'{self.base_url}/{endpoint}', params={
+            'lat': coords[0], 'lon': coords[1], 'appid': Config.WEATHER_API_KEY, 'units': 'metric'
+        }, timeout=Config.PROVIDER_TIMEOUT)
+        res.raise_for_status()
+        return res.json()
+
+    @staticmethod
+    def _normalize(item):
+        rain = item.get('rain', {})
+        snow = item.get('snow', {})
+        precipitation = rain.get('1h', rain.get('3h', 0) / 3) + snow.get('1h', snow.get('3h', 0) / 3)
+        weather = (item.get('weather') or [{}])[0]
+        return {
+            'main': weather.get('main', 'Clear'),
+            'description': weather.get('description', ''),
+            'temp': round(item['main']['temp'], 1),
+            'humidity': item['main'].get('humidity'),
+            'wind_speed': item.get('wind', {}).get('speed', 0),
+            'precipitation': round(precipitation, 2),
+        }
+
+    def current(self, coords):
+        return self._normalize(self._get('weather', coords))
+
+    def forecast(self, coords):
+        data = self._get('forecast', coords)
+        if str(data.get('cod')) != '200':
+            raise ProviderError(f"OpenWeatherMap forecast failed: {data.get('message')}")
+        offset = timedelta(seconds=data.get('city', {}).get('timezone', 0))
+        days = {}
+        for item in data.get('list', []):
+            date = (datetime.fromtimestamp(item['dt'], timezone.utc) + offset).strftime('%Y-%m-%d')
+            days.setdefault(date, []).append(self._normalize(item))
+
+        # Each day: its worst conditions, mean temperature, strongest wind and mean precipitation rate
+        forecast = []
+        for date, steps in sorted(days.items())[:FORECAST_DAYS]:
+            day = dict(min(steps, key=_severity))
+            day['temp'] = round(sum(step['temp'] for step in steps) / len(steps), 1)
+            day['wind_speed'] = max(step['wind_speed'] for step in steps)
+            day['precipitation'] = round(sum(step['precipitation'] for step in steps) / len(steps), 2)
+            day['date'] = date
+            forecast.append(day)
+        return forecast
+
+
+class StubWeatherProvider(WeatherProvider):
+    """
+    Deterministic offline weather for tests and development: conditions are
+    derived from a hash of the tile and the hour (current) or date (forecast)
+    """
+    name = 'stub'
+
+    CONDITIONS = [
+        {'main': 'Clear', 'description': 'clear sky', 'temp': 22, 'humidity': 50, 'wind_speed': 3, 'precipitation': 0},
+        {'main': 'Clouds', 'description': 'few clouds', 'temp': 18, 'humidity': 60, 'wind_speed': 5, 'precipitation': 0},
+        {'main': 'Rain', 'description': 'light rain', 'temp': 15, 'humidity': 80, 'wind_speed': 6, 'precipitation': 1.2},
+        {'main': 'Snow', 'description': 'light snow', 'temp': 0, 'humidity': 90, 'wind_speed': 4, 'precipitation': 0.8},
+        {'main': 'Thunderstorm', 'description': 'thunderstorm', 'temp': 17, 'humidity': 85, 'wind_speed': 12, 'precipitation': 6.0},
+    ]
+
+    def _condition(self, coords, when):
+        digest = hashlib.md5(f'{coords[0]:.4f},{coords[1]:.4f}:{when}'.encode()).digest()
+        return dict(self.CONDITIONS[digest[0] % len(self.CONDITIONS)])
+
+    def current(self, coords):
+        return self._condition(coords, datetime.now(timezone.utc).strftime('%Y-%m-%dT%H'))
+
+    def forecast(self, coords):
+        today = datetime.now(timezone.utc).date()
+        forecast = []
+        for i in range(FORECAST_DAYS):
+            date = (today + timedelta(days=i)).strftime('%Y-%m-%d')
+            day = self._condition(coords, date)
+            day['date'] = date
+            forecast.append(day)
+        return forecast
+
+
+WEATHER_PROVIDERS = {
+    'openweathermap': OpenWeatherMapProvider(),
+    'stub': StubWeatherProvider(),
+}
+
+
+def current_weather(coords):
+    """Current conditions for the tile containing (lat, lng), or None if no provider answered"""
+    return cached_weather(
+        'current', coords,
+        lambda tile: _first_result(WEATHER_PROVIDERS, Config.WEATHER_PROVIDERS, 'current', tile),
+        Config.WEATHER_CURRENT_BUCKET
+    )
+
+
+def weather_forecast(coords, days=FORECAST_DAYS):
+    """Up to `days` (max FORECAST_DAYS) daily conditions for the tile containing (lat, lng), or None"""
+    forecast = cached_weather(
+        'forecast', coords,
+        lambda tile: _first_result(WEATHER_PROVIDERS, Config.WEATHER_PROVIDERS, 'forecast', tile),
+        Config.WEATHER_FORECAST_BUCKET
+    )
+    return forecast[:days] if forecast is not None else None
+
+
+def weather_many(points):
+    """
+    Current conditions for many (lat, lng) points, fetching each tile once
+
+    Returns:
+        list: Conditions (or None) aligned with points
+    """
+    by_tile = {}
+    for point in points:
+        tile = weather_tile(point)
+        if tile not in by_tile:
+            by_tile[tile] = current_weather(tile)
+    return [by_tile[weather_tile(point)] for point in points]
+
+
+def route_sample_points(start, end, samples=None):
+    """
+    Up to `samples` evenly spaced (lat, lng) points from start to end, at
+    most one per weather tile
+    """
+    samples = samples or Config.WEATHER_ROUTE_SAMPLES
+    span = max(abs(end[0] - start[0]), abs(end[1] - start[1]))
+    count = max(2, min(samples, math.ceil(span / Config.WEATHER_TILE_DEGREES) + 1))
+    points, tiles = [], set()
+    for i in range(count):
+        fraction = i / (count - 1)
+        point = (start[0] + (end[0] - start[0]) * fraction, start[1] + (end[1] - start[1]) * fraction)
+        tile = weather_tile(point)
+        if tile not in tiles:
+            tiles.add(tile)
+            points.append(point)
+    return points
+
+
+def weather_advice(conditions):
+    """
+    Transport suggestion for the conditions along a route
+
+    Args:
+        conditions (list): Current conditions per sampled point (None entries are skipped)
+
+    Returns:
+        dict: {'conditions', 'avoid', 'prefer', 'message'}, or None when the weather suits every mode
+    """
+    conditions = [c for c in conditions if c]
+    if not conditions:
+        return None
+
+    reasons = []
+    worst = min(conditions, key=_severity)
+    if worst['main'] in WET_CONDITIONS:
+        reasons.append(worst['description'] or worst['main'].lower())
+    if any(c['temp'] is not None and c['temp'] <= COLD_TEMP for c in conditions):
+        reasons.append('freezing temperatures')
+    if any(c['temp'] is not None and c['temp'] >= HOT_TEMP for c in conditions):
+        reasons.append('high temperatures')
+    if any((c.get('wind_speed') or 0) >= WINDY_SPEED for c in conditions):
+        reasons.append('strong wind')
+    if not reasons:
+        return None
+
+    summary = reasons[0] if len(reasons) == 1 else f"{', '.join(reasons[:-1])} and {reasons[-1]}"
+    return {
+        'conditions': reasons,
+        'avoid': list(ACTIVE_MODES),
+        'prefer': list(SHELTERED_MODES),
+        'message': f'{summary[0].upper()}{summary[1:]} along your route. '
+                   f'The bus or train keeps you sheltered and still emits far less than driving.'
+    }
+
+
+def route_weather(start, end):
+    """
+    Weather sampled along a route and the suggestion it leads to
+
+    Returns:
+        dict: {'points': [{'lat', 'lng', 'weather'}], 'advice'}, or None if no weather is available
+    """
+    points = route_sample_points(start, end)
+    conditions = weather_many(points)
+    if not any(conditions):
+        return None
+    return {
+        'points': [{'lat': lat, 'lng': lng, 'weather': weather} for (lat, lng), weather in zip(points, conditions)],
+        'advice': weather_advice(conditions)
+    }
+
+
+def weather_provider_status():
+    """Breaker state, call counts and latency for every weather provider"""
+    return {
+        'providers': {name: p.status() for name, p in WEATHER_PROVIDERS.items()},
+        'order': Config.WEATHER_PROVIDERS,
+    }